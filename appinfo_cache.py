@@ -0,0 +1,80 @@
+import json
+import os
+import os.path
+
+CACHE_VERSION = 2
+
+# the appinfo keys read by SteamDataReader.get_missing_cover_dict_from_app_details
+PROJECTION_PATHS = [("common","type"),("common","name"),("common","library_assets"),("common","header_image")]
+# official artwork in the library_assets section, the header image is directly in common
+LIBRARY_ASSET_KEYS = ("library_capsule","library_hero","library_logo")
+
+class AppinfoCache:
+    """
+    On-disk cache of the few appinfo fields used to find games missing covers.
+    Each app is stored as ``[change_number, type, name, assets]`` where
+    ``assets`` lists the official artwork keys the app has, apps without a
+    ``common`` section are stored with ``type`` set to None.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.apps = {}
+        self.dirty = False
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path,encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print("Ignoring unreadable appinfo cache",self.path)
+            return
+        if data.get("version") != CACHE_VERSION:
+            return
+        self.apps = {int(appid):entry for appid,entry in data["apps"].items()}
+
+    def save(self):
+        if not self.dirty:
+            return
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname,exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path,"w",encoding="utf-8") as f:
+            json.dump({"version":CACHE_VERSION,"apps":self.apps},f,separators=(',',':'))
+        os.replace(tmp_path,self.path)
+        self.dirty = False
+
+    def get(self, appid, change_number):
+        entry = self.apps.get(appid)
+        if entry is None or entry[0] != change_number:
+            return None
+        return entry
+
+    def update(self, appid, change_number, app):
+        if "common" in app:
+            common = app["common"]
+            library_assets = common.get("library_assets")
+            assets = [key for key in LIBRARY_ASSET_KEYS if isinstance(library_assets,dict) and key in library_assets]
+            if "header_image" in common:
+                assets.append("header_image")
+            entry = [change_number, common.get("type",""), common.get("name",""), assets]
+        else:
+            entry = [change_number, None, None, []]
+        self.apps[appid] = entry
+        self.dirty = True
+        return entry
+
+    @staticmethod
+    def to_app_details(entry):
+        _, app_type, name, assets = entry
+        if app_type is None:
+            return {}
+        common = {"type":app_type,"name":name}
+        library_assets = {key:"" for key in assets if key in LIBRARY_ASSET_KEYS}
+        if library_assets:
+            common["library_assets"] = library_assets
+        if "header_image" in assets:
+            common["header_image"] = {}
+        return {"common":common}
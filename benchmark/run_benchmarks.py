@@ -0,0 +1,192 @@
+"""
+Benchmarks of the appcache, vdf and licensecache parsers on synthetic data.
+
+Every benchmark reports its best time over ``--repeat`` runs, the throughput
+in entries and megabytes per second and the peak memory allocated by Python
+during one extra run. Results can be saved as a baseline and later runs are
+compared against it; the exit code is 1 if any benchmark got slower than the
+baseline by more than ``--threshold``. Runs are compared by their throughput
+and only on data of the same scale as the baseline, otherwise the exit code
+is 2.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import os.path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vdf
+import license_parser
+import synthetic
+from appinfo_cache import PROJECTION_PATHS
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def load_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def find_steamid32(steam_path):
+    """
+    Returns the steamid32 of the first user with a licensecache in ``steam_path``.
+    """
+    userdata = os.path.join(steam_path, "userdata")
+    for name in sorted(os.listdir(userdata), key=lambda name: (len(name), name)):
+        if name.isdigit() and os.path.isfile(os.path.join(userdata, name, "config", "licensecache")):
+            return int(name)
+    raise FileNotFoundError("No licensecache found in " + userdata)
+
+
+def benchmarks(steam_path, steamid32):
+    """
+    Returns the scale of the data, ``{"apps", "packages", "users", "licenses"}``,
+    and ``(name, func, entries, size)`` of every benchmark.
+    """
+    appinfo_path = os.path.join(steam_path, "appcache", "appinfo.vdf")
+    packageinfo_path = os.path.join(steam_path, "appcache", "packageinfo.vdf")
+    loginusers_path = os.path.join(steam_path, "config", "loginusers.vdf")
+    licensecache_path = os.path.join(steam_path, "userdata", str(steamid32), "config", "licensecache")
+
+    appinfo = load_bytes(appinfo_path)
+    packageinfo = load_bytes(packageinfo_path)
+    app_index = vdf.appinfo_index(appinfo)
+    apps = len(app_index)
+    packages = len(vdf.packageinfo_index(packageinfo))
+    with open(loginusers_path, encoding="utf-8") as f:
+        loginusers = f.read()
+    users = len(vdf.loads(loginusers)["users"])
+    licenses = len(license_parser.parse(licensecache_path, steamid32).licenses)
+    # one binary vdf document holding the first 5000 apps
+    lazy = vdf.appinfo_lazy_loads(appinfo)
+    blob = vdf.binary_dumps({str(appid): lazy[appid] for appid in list(app_index)[:5000]})
+
+    def project_all():
+        lazy = vdf.appinfo_lazy_loads(appinfo)
+        for appid in lazy:
+            lazy.project(appid, PROJECTION_PATHS)
+
+    scale = {"apps": apps, "packages": packages, "users": users, "licenses": licenses}
+    return scale, [
+        ("appinfo_loads", lambda: vdf.appinfo_loads(appinfo), apps, len(appinfo)),
+        ("appinfo_index", lambda: vdf.appinfo_index(appinfo), apps, len(appinfo)),
+        ("appinfo_project", project_all, apps, len(appinfo)),
+        ("packageinfo_loads", lambda: vdf.packageinfo_loads(packageinfo), packages, len(packageinfo)),
+        ("packageinfo_index", lambda: vdf.packageinfo_index(packageinfo), packages, len(packageinfo)),
+        ("binary_loads", lambda: vdf.binary_loads(blob), min(apps, 5000), len(blob)),
+        ("parse", lambda: vdf.parse(io.StringIO(loginusers)), users, len(loginusers)),
+        ("license_parse", lambda: license_parser.parse(licensecache_path, steamid32), licenses,
+         os.path.getsize(licensecache_path)),
+    ]
+
+
+def run(func, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns ``(name, ratio)`` of the benchmarks whose throughput dropped by more
+    than ``threshold``, ratio is the slowdown against the baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = baseline[name]["entries_per_second"] / result["entries_per_second"]
+        result["baseline_ratio"] = ratio
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the parsers on synthetic Steam files.')
+    parser.add_argument('-a', '--apps', type=int, default=20000, help='Number of apps to generate, 1000 to 200000.')
+    parser.add_argument('-u', '--users', type=int, default=50, help='Number of users in loginusers.vdf.')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs per benchmark, the best one is reported.')
+    parser.add_argument('-k', '--only', default=None, help='Comma separated names of benchmarks to run.')
+    parser.add_argument('--data', default=None, help='Directory to generate the files in, reused if it exists.')
+    parser.add_argument('--steamid', type=int, default=None,
+                        help='Steamid32 of the licensecache to parse, the first user of the data by default.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file to compare against.')
+    parser.add_argument('--save-baseline', action='store_true', help='Save the results as the new baseline.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Slowdown against the baseline reported as regression.')
+    parser.add_argument('-o', '--output', default=None, help='Write the results as json to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        steam_path = args.data or tmpdir
+        if not os.path.isfile(os.path.join(steam_path, "appcache", "appinfo.vdf")):
+            print("Generating synthetic steam files with {} apps in {}".format(args.apps, steam_path))
+            steamid32 = synthetic.generate(steam_path, apps=args.apps, users=args.users)
+        else:
+            steamid32 = find_steamid32(steam_path)
+        if args.steamid is not None:
+            steamid32 = args.steamid
+
+        only = set(args.only.split(",")) if args.only else None
+        results = {}
+        scale, benches = benchmarks(steam_path, steamid32)
+        scale["repeat"] = args.repeat
+        for name, func, entries, size in benches:
+            if only and name not in only:
+                continue
+            seconds, peak = run(func, args.repeat)
+            results[name] = {
+                "seconds": seconds,
+                "entries_per_second": entries / seconds,
+                "mb_per_second": size / seconds / 1e6,
+                "peak_memory_mb": peak / 1e6,
+                "entries": entries,
+            }
+            print("{:<20} {:>9.4f}s {:>12.0f} entries/s {:>8.1f} MB/s {:>9.1f} MB peak".format(
+                name, seconds, entries / seconds, size / seconds / 1e6, peak / 1e6))
+
+    regressions = []
+    if os.path.isfile(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != scale:
+            # throughput depends on the size of the data and the number of runs
+            print("The baseline was measured at {}, this run at {}, not comparing".format(
+                baseline.get("scale", "an unknown scale"), scale))
+            sys.exit(2)
+        regressions = compare(results, baseline["results"], args.threshold)
+        for name, ratio in regressions:
+            print("Regression: {} is {:.0%} slower than the baseline".format(name, ratio - 1))
+        if not regressions:
+            print("No regressions against", args.baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"scale": scale, "results": results}, f, indent=2)
+        print("Saved baseline to", args.baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
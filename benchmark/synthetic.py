@@ -0,0 +1,187 @@
+"""
+Generators of synthetic Steam client files for benchmarking the parsers.
+
+The files follow the layout of a Steam install, so the generated directory can
+also be used as the steam path of the downloader:
+
+* ``appcache/appinfo.vdf``
+* ``appcache/packageinfo.vdf``
+* ``config/loginusers.vdf``
+* ``userdata/<steamid32>/config/licensecache``
+"""
+import argparse
+import hashlib
+import os
+import os.path
+import random
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vdf
+
+APPINFO_MAGIC = 0x07564427
+PACKAGEINFO_MAGIC = 0x06565528
+STEAMID64_BASE = 76561197960265728
+LANGUAGES = ["english", "german", "french", "schinese", "japanese", "russian", "spanish", "koreana"]
+APP_TYPES = ["Game"] * 6 + ["DLC"] * 3 + ["Tool", "Demo", "Music", "Application"]
+
+
+def _word(rnd):
+    return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(3, 10)))
+
+
+def make_app(rnd, appid):
+    """
+    Returns an appinfo entry shaped like the ones of the Steam client.
+    """
+    app_type = rnd.choice(APP_TYPES)
+    common = {
+        "name": " ".join(_word(rnd).capitalize() for _ in range(rnd.randint(1, 4))),
+        "type": app_type,
+        "oslist": rnd.choice(["windows", "windows,macos", "windows,macos,linux"]),
+        "osarch": "64",
+        "icon": hashlib.sha1(str(appid).encode()).hexdigest(),
+        "metacritic_score": rnd.randint(40, 95),
+        "review_score": rnd.randint(1, 9),
+        "languages": {lang: 1 for lang in rnd.sample(LANGUAGES, rnd.randint(1, len(LANGUAGES)))},
+        "associations": {str(i): {"type": "developer", "name": _word(rnd)} for i in range(rnd.randint(1, 3))},
+        "category": {"category_{}".format(rnd.randint(1, 60)): 1 for _ in range(rnd.randint(2, 12))},
+        "steam_release_date": rnd.randint(1100000000, 1700000000),
+    }
+    if rnd.random() < 0.7:
+        common["library_assets"] = {"library_capsule": "en", "library_hero": "en", "library_logo": "en"}
+    # derived from the appid so the random sequence of older data sets is unchanged
+    if appid // 10 % 10:
+        common["header_image"] = {"english": "header.jpg"}
+    app = {"appid": appid, "common": common}
+    if app_type == "Game":
+        app["extended"] = {"developer": _word(rnd), "publisher": _word(rnd), "homepage": "https://" + _word(rnd) + ".com"}
+        app["config"] = {
+            "installdir": _word(rnd),
+            "launch": {str(i): {"executable": _word(rnd) + ".exe", "type": "default"} for i in range(rnd.randint(1, 3))},
+        }
+        app["depots"] = {
+            str(appid + i): {
+                "config": {"oslist": "windows"},
+                "manifests": {"public": {"gid": str(rnd.getrandbits(63)), "size": str(rnd.getrandbits(32))}},
+                "maxsize": str(rnd.getrandbits(32)),
+            } for i in range(1, rnd.randint(2, 8))
+        }
+        app["depots"]["branches"] = {"public": {"buildid": str(rnd.randint(1, 10**7)), "timeupdated": str(rnd.randint(1100000000, 1700000000))}}
+        app["localization"] = {lang: {"store_tags": {str(i): rnd.randint(1, 5000) for i in range(rnd.randint(3, 15))}}
+                               for lang in rnd.sample(LANGUAGES, rnd.randint(0, 3))}
+    return {"appinfo": app}
+
+
+def appinfo_dumps(count, seed=0):
+    rnd = random.Random(seed)
+    chunks = [struct.pack("<II", APPINFO_MAGIC, 1)]
+    appid = 0
+    for change_number in range(1, count + 1):
+        appid += rnd.randint(1, 20) * 10
+        blob = vdf.binary_dumps(make_app(rnd, appid))
+        checksum = hashlib.sha1(blob).digest()
+        # size counts everything after the size field itself
+        chunks.append(struct.pack("<III", appid, len(blob) + 40, 2))
+        chunks.append(struct.pack("<IQ20sI", rnd.randint(1100000000, 1700000000), 0, checksum, change_number))
+        chunks.append(blob)
+    chunks.append(struct.pack("<I", 0))
+    return b"".join(chunks)
+
+
+def packageinfo_dumps(count, appids, seed=0):
+    rnd = random.Random(seed)
+    chunks = [struct.pack("<II", PACKAGEINFO_MAGIC, 1)]
+    for packageid in range(count):
+        package = {
+            "packageid": packageid,
+            "billingtype": rnd.randint(0, 12),
+            "licensetype": 1,
+            "status": 0,
+            "extended": {"allowcrossregiontradingandgifting": "false"},
+            "appids": {str(i): appid for i, appid in enumerate(rnd.sample(appids, min(len(appids), rnd.randint(1, 4))))},
+            "depotids": {str(i): rnd.randint(1, 10**6) for i in range(rnd.randint(0, 6))},
+            "appitems": {},
+        }
+        blob = vdf.binary_dumps({str(packageid): package})
+        chunks.append(struct.pack("<I20sIQ", packageid, hashlib.sha1(blob).digest(), packageid + 1, 0))
+        chunks.append(blob)
+    chunks.append(struct.pack("<I", 0xffffffff))
+    return b"".join(chunks)
+
+
+def loginusers_dumps(count, seed=0):
+    rnd = random.Random(seed)
+    users = {}
+    for i in range(count):
+        users[str(STEAMID64_BASE + 1000 + i)] = {
+            "AccountName": _word(rnd),
+            "PersonaName": _word(rnd).capitalize(),
+            "RememberPassword": "1",
+            "WantsOfflineMode": "0",
+            "SkipOfflineModeWarning": "0",
+            "AllowAutoLogin": "1",
+            "MostRecent": "1" if i == 0 else "0",
+            "Timestamp": str(rnd.randint(1100000000, 1700000000)),
+        }
+    return vdf.dumps({"users": users}, pretty=True)
+
+
+def licensecache_dumps(count, steamid32, seed=0):
+    # imported here, the steam protobufs are only needed for this file
+    import license_parser
+    from steam.protobufs.steammessages_clientserver_pb2 import CMsgClientLicenseList
+
+    rnd = random.Random(seed)
+    msg = CMsgClientLicenseList()
+    msg.eresult = 1
+    for packageid in range(count):
+        msg.licenses.add(package_id=packageid, time_created=rnd.randint(1100000000, 1700000000),
+                         license_type=1, flags=rnd.choice([0, 512]), change_number=rnd.randint(1, 10**7),
+                         owner_id=steamid32, access_token=rnd.getrandbits(63))
+    data = msg.SerializeToString()
+    data += struct.pack("<I", rnd.getrandbits(32))
+    return bytes(license_parser.RandomStream().decrypt_data(steamid32, data))
+
+
+def appids_of(appinfo_data):
+    return list(vdf.appinfo_index(appinfo_data).keys())
+
+
+def generate(path, apps=10000, packages=None, users=1, licenses=None, seed=0):
+    """
+    Writes a synthetic Steam install to ``path``. Returns the steamid32 of
+    the first user, who owns the generated licensecache.
+    """
+    packages = packages if packages is not None else max(1, apps // 5)
+    licenses = licenses if licenses is not None else max(1, packages // 4)
+    steamid32 = 1000
+
+    os.makedirs(os.path.join(path, "appcache"), exist_ok=True)
+    os.makedirs(os.path.join(path, "config"), exist_ok=True)
+    os.makedirs(os.path.join(path, "userdata", str(steamid32), "config"), exist_ok=True)
+
+    appinfo = appinfo_dumps(apps, seed)
+    with open(os.path.join(path, "appcache", "appinfo.vdf"), "wb") as f:
+        f.write(appinfo)
+    with open(os.path.join(path, "appcache", "packageinfo.vdf"), "wb") as f:
+        f.write(packageinfo_dumps(packages, appids_of(appinfo), seed))
+    with open(os.path.join(path, "config", "loginusers.vdf"), "w", encoding="utf-8") as f:
+        f.write(loginusers_dumps(users, seed))
+    with open(os.path.join(path, "userdata", str(steamid32), "config", "licensecache"), "wb") as f:
+        f.write(licensecache_dumps(licenses, steamid32, seed))
+    return steamid32
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generates a synthetic Steam install for benchmarking.')
+    parser.add_argument('path', help='Directory to write the files to.')
+    parser.add_argument('-a', '--apps', type=int, default=10000, help='Number of apps in appinfo.vdf.')
+    parser.add_argument('-p', '--packages', type=int, default=None, help='Number of packages in packageinfo.vdf, apps/5 by default.')
+    parser.add_argument('-u', '--users', type=int, default=1, help='Number of users in loginusers.vdf.')
+    parser.add_argument('-l', '--licenses', type=int, default=None, help='Number of licenses in licensecache, packages/4 by default.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+    args = parser.parse_args()
+    generate(args.path, args.apps, args.packages, args.users, args.licenses, args.seed)
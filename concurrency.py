@@ -0,0 +1,63 @@
+import time
+
+
+class ConcurrencyController:
+    """
+    Picks the number of concurrent downloads by hill climbing on throughput.
+
+    Every ``interval`` seconds the completed downloads per second are compared
+    with the previous interval. The number of downloads keeps moving in the
+    same direction while throughput improves and turns around when it does
+    not. It is halved when more than ``max_error_rate`` of the downloads in
+    an interval failed. Nothing is changed while there is no work waiting.
+    """
+    def __init__(self, initial=20, min_workers=2, max_workers=64, interval=2.0, max_error_rate=0.2, tolerance=0.05):
+        self.min_workers = min(min_workers, max_workers)
+        self.max_workers = max_workers
+        self.target = max(self.min_workers, min(initial, max_workers))
+        self.interval = interval
+        self.max_error_rate = max_error_rate
+        self.tolerance = tolerance
+        self.direction = 1
+        self.last_throughput = None
+        self._reset()
+
+    def _reset(self):
+        self.successes = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+    def on_success(self):
+        self.successes += 1
+
+    def on_error(self):
+        self.errors += 1
+
+    def adjust(self, backlog):
+        """
+        Returns the new number of downloads, ``backlog`` is the number of
+        downloads waiting for a consumer.
+        """
+        elapsed = time.monotonic() - self.started
+        done = self.successes + self.errors
+        if backlog == 0 or done == 0 or elapsed <= 0:
+            if backlog == 0:
+                self.last_throughput = None
+                self._reset()
+            return self.target
+        throughput = self.successes / elapsed
+        error_rate = self.errors / done
+        step = max(1, self.target // 4)
+        if error_rate > self.max_error_rate:
+            # the server or the link is overloaded, back off and probe upwards again later
+            self.target //= 2
+            self.direction = 1
+            self.last_throughput = None
+        else:
+            if self.last_throughput is not None and throughput < self.last_throughput * (1 + self.tolerance):
+                self.direction = -self.direction
+            self.target += self.direction * step
+            self.last_throughput = throughput
+        self.target = max(self.min_workers, min(self.max_workers, self.target))
+        self._reset()
+        return self.target
@@ -0,0 +1,115 @@
+"""
+Local store of downloaded covers shared by all accounts and runs.
+
+SteamGridDB never changes the file behind a grid url, so covers are stored
+under the sha1 of their url. Files are put into grid folders by reflink
+where the filesystem supports it, otherwise by copy. Hardlinks are not used,
+they would share the file with the store and an edit in the grid folder
+would change the stored cover. The mtime of a cover is bumped on every hit
+and used for LRU eviction once the store grows beyond its maximum size.
+"""
+import hashlib
+import os
+import os.path
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ioctl request of linux to share the extents of another file
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        return False
+    with open(src,"rb") as s, open(dst,"wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(),FICLONE,s.fileno())
+            return True
+        except OSError:
+            pass
+    os.remove(dst)
+    return False
+
+
+def clone_file(src, dst):
+    """
+    Atomically creates ``dst`` with the content of ``src``.
+    """
+    tmp_path = dst + ".part"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    if not _reflink(src,tmp_path):
+        shutil.copyfile(src,tmp_path)
+    os.replace(tmp_path,dst)
+
+
+class CoverStore:
+    def __init__(self, path, max_size=500*1024*1024):
+        self.path = path
+        self.max_size = max_size
+        self.size = None
+        # add is called from the thread pool of the grid writer
+        self.lock = threading.Lock()
+
+    def object_path(self, url):
+        ext = os.path.splitext(url)[1]
+        return os.path.join(self.path,hashlib.sha1(url.encode("utf-8")).hexdigest() + ext)
+
+    def get(self, url):
+        path = self.object_path(url)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def materialize(self, url, dst):
+        clone_file(self.object_path(url),dst)
+
+    def add(self, url, src):
+        os.makedirs(self.path,exist_ok=True)
+        path = self.object_path(url)
+        with self.lock:
+            if os.path.isfile(path):
+                return
+            clone_file(src,path)
+            if self.size is None:
+                self._scan_size()
+            else:
+                self.size += os.path.getsize(path)
+            if self.size > self.max_size:
+                self.evict()
+
+    def _objects(self):
+        if not os.path.isdir(self.path):
+            return []
+        return [entry for entry in os.scandir(self.path) if not entry.name.endswith(".part")]
+
+    @staticmethod
+    def _stat(entry):
+        try:
+            return entry.stat()
+        except OSError:
+            return None
+
+    def _scan_size(self):
+        self.size = sum(st.st_size for st in map(self._stat,self._objects()) if st)
+
+    def evict(self):
+        # drop least recently used covers until the store is below 90% of its cap
+        entries = [(entry,st) for entry,st in ((entry,self._stat(entry)) for entry in self._objects()) if st]
+        entries.sort(key=lambda item:item[1].st_mtime)
+        target = self.max_size * 0.9
+        for entry,st in entries:
+            if self.size <= target:
+                break
+            self.size -= st.st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
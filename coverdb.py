@@ -0,0 +1,119 @@
+"""
+Compact form of missingcoverdb.json.
+
+The file holds a header, a sorted array of appids, an array of offsets into
+a blob of utf-8 names and the blob itself. It is memory mapped and probed
+with binary search, so only owned appids are ever looked at.
+"""
+import argparse
+import json
+import mmap
+import os
+import os.path
+import struct
+
+MAGIC = b'MCDB'
+VERSION = 1
+header_struct = struct.Struct("<4sII")
+uint32 = struct.Struct("<I")
+
+
+def convert(json_path, db_path):
+    with open(json_path,encoding="utf-8") as f:
+        apps = {int(appid):name for appid,name in json.load(f).items()}
+    appids = sorted(apps)
+    names = [apps[appid].encode("utf-8") for appid in appids]
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+
+    dirname = os.path.dirname(db_path)
+    if dirname:
+        os.makedirs(dirname,exist_ok=True)
+    tmp_path = db_path + ".tmp"
+    with open(tmp_path,"wb") as f:
+        f.write(header_struct.pack(MAGIC,VERSION,len(appids)))
+        f.write(struct.pack("<{}I".format(len(appids)),*appids))
+        f.write(struct.pack("<{}I".format(len(offsets)),*offsets))
+        f.write(b''.join(names))
+    os.replace(tmp_path,db_path)
+    return len(appids)
+
+
+class CoverDB:
+    def __init__(self, path):
+        with open(path,"rb") as f:
+            # mmap refuses empty files, a truncated header is just as invalid
+            if os.fstat(f.fileno()).st_size < header_struct.size:
+                raise ValueError("Truncated missing cover database " + path)
+            self.data = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        magic, version, self.count = header_struct.unpack_from(self.data,0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError("Invalid missing cover database " + path)
+        self.appids_offset = header_struct.size
+        self.names_index_offset = self.appids_offset + 4 * self.count
+        self.names_offset = self.names_index_offset + 4 * (self.count + 1)
+        if (len(self.data) < self.names_offset or
+                len(self.data) < self.names_offset + uint32.unpack_from(self.data,self.names_offset - 4)[0]):
+            self.data.close()
+            raise ValueError("Truncated missing cover database " + path)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.data.close()
+
+    def find(self, appid):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if uint32.unpack_from(self.data,self.appids_offset + 4 * mid)[0] < appid:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and uint32.unpack_from(self.data,self.appids_offset + 4 * lo)[0] == appid:
+            return lo
+        return -1
+
+    def get(self, appid, default=None):
+        index = self.find(appid)
+        if index == -1:
+            return default
+        start, end = struct.unpack_from("<II",self.data,self.names_index_offset + 4 * index)
+        return self.data[self.names_offset + start:self.names_offset + end].decode("utf-8")
+
+    def intersect(self, appids):
+        rst = {}
+        for appid in appids:
+            name = self.get(appid)
+            if name is not None:
+                rst[appid] = name
+        return rst
+
+
+def load(db_path, json_path):
+    """
+    Opens the compact database, rebuilding it from ``json_path`` when it is
+    missing, older than the json file or invalid.
+    """
+    if os.path.isfile(json_path) and (not os.path.isfile(db_path) or
+                                      os.path.getmtime(db_path) < os.path.getmtime(json_path)):
+        convert(json_path,db_path)
+    try:
+        return CoverDB(db_path)
+    except ValueError as ex:
+        if not os.path.isfile(json_path):
+            raise
+        print("{}, rebuilding it from {}".format(ex,json_path))
+    convert(json_path,db_path)
+    return CoverDB(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Converts missingcoverdb.json to the compact indexed format.')
+    parser.add_argument('json_path', help='Path of missingcoverdb.json.')
+    parser.add_argument('db_path', help='Path of the compact database to write.')
+    args = parser.parse_args()
+    print("Converted {} apps".format(convert(args.json_path,args.db_path)))
@@ -0,0 +1,102 @@
+"""
+Journal of a cover download run, used to resume interrupted runs.
+
+The journal is a json-lines file. The first line holds the apps the run
+works on and the grid paths each asset goes to by asset kind, every following
+line records a state change of one asset of an app:
+
+* ``chosen``: the cover to download was picked, with ``cover_id``, ``url``
+  and ``author``
+* ``downloaded``: the cover was saved
+* ``failed``: nothing was saved, ``reason`` tells why
+"""
+import json
+import os
+import os.path
+
+from grid_index import EXTENSIONS, asset_filename
+
+# failures that are worth another try when a run is resumed
+RETRY_REASONS = {"download"}
+
+
+class DownloadJournal:
+    def __init__(self, path):
+        self.path = path
+        self.apps = {}
+        self.targets = {}
+        self.states = {}
+        self.f = None
+
+    def load(self):
+        """
+        Reads a previous journal, returns False if there is none to resume.
+        Records of a resumed run are appended to it.
+        """
+        self.close()
+        self.apps = {}
+        self.targets = {}
+        self.states = {}
+        if not os.path.isfile(self.path):
+            return False
+        with open(self.path,encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last line may be cut off by an interrupted run
+                    continue
+                if "run" in record:
+                    self.apps = {int(appid):name for appid,name in record["run"]["apps"].items()}
+                    # journals written before asset kinds only held portrait covers
+                    targets = record["run"].get("targets") or {"portrait":record["run"].get("grids",{})}
+                    self.targets = {kind:{int(appid):paths for appid,paths in grids.items()}
+                                    for kind,grids in targets.items() if grids}
+                else:
+                    self.states[record.get("kind","portrait"),record["appid"]] = record
+        if not self.apps:
+            return False
+        self.f = open(self.path,"a",encoding="utf-8")
+        return True
+
+    def start(self, apps, targets=None):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname,exist_ok=True)
+        self.close()
+        self.apps = dict(apps)
+        self.targets = dict(targets or {})
+        self.states = {}
+        self.f = open(self.path,"w",encoding="utf-8")
+        self._write({"run":{"apps":self.apps,"targets":self.targets}})
+
+    def _write(self, record):
+        self.f.write(json.dumps(record) + "\n")
+        self.f.flush()
+
+    def record(self, appid, state, kind="portrait", **fields):
+        record = {"appid":appid,"kind":kind,"state":state,**fields}
+        self.states[kind,appid] = record
+        if self.f:
+            self._write(record)
+
+    def state(self, appid, kind="portrait"):
+        return self.states.get((kind,appid))
+
+    def is_done(self, appid, gridpaths, kind="portrait"):
+        record = self.states.get((kind,appid))
+        if record is None:
+            return False
+        if record["state"] == "downloaded":
+            # covers are renamed into place in batches, so check they made it to every grid
+            gridpaths = [gridpaths] if isinstance(gridpaths,str) else gridpaths
+            return all(any(os.path.isfile(os.path.join(gridpath,asset_filename(appid,kind,ext))) for ext in EXTENSIONS)
+                       for gridpath in gridpaths)
+        if record["state"] == "failed":
+            return record["reason"] not in RETRY_REASONS
+        return False
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
@@ -0,0 +1,134 @@
+"""
+Waits for changes of files and directories.
+
+Linux uses inotify through libc, other systems poll the modification times.
+Files are watched through their directory since Steam replaces them instead
+of writing them in place.
+"""
+import ctypes
+import ctypes.util
+import os
+import os.path
+import select
+import struct
+import sys
+import time
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileWatcher:
+    """
+    ``wait`` blocks until one of ``paths`` changed and returns the changed
+    ones. Changes are collected until nothing changed for ``settle`` seconds,
+    so a file written in several steps is reported once.
+    """
+    def __init__(self, paths, interval=5, settle=1):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.interval = interval
+        self.settle = settle
+        self.fd = None
+        self.watches = {}
+        libc = _load_libc()
+        if libc is not None:
+            self._init_inotify(libc)
+        if self.fd is None:
+            self.snapshot = self._stat_all()
+
+    def _init_inotify(self, libc):
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            return
+        self.fd = fd
+        for path in self.paths:
+            dirname = path if os.path.isdir(path) else os.path.dirname(path)
+            wd = libc.inotify_add_watch(fd, dirname.encode(sys.getfilesystemencoding()), WATCH_MASK)
+            if wd < 0:
+                print("Failed to watch {}: {}, polling instead".format(dirname, os.strerror(ctypes.get_errno())))
+                self.close()
+                return
+            self.watches[wd] = dirname
+
+    def _read_events(self, timeout):
+        changed = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+        data = os.read(self.fd, 65536)
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(sys.getfilesystemencoding(), "replace")
+            offset += length
+            dirname = self.watches.get(wd)
+            if dirname is None:
+                continue
+            for path in self.paths:
+                if path == dirname or path == os.path.join(dirname, name):
+                    changed.add(path)
+        return changed
+
+    def _stat_all(self):
+        snapshot = {}
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                snapshot[path] = None
+        return snapshot
+
+    def _poll(self, timeout):
+        time.sleep(timeout)
+        snapshot = self._stat_all()
+        changed = {path for path in self.paths if snapshot[path] != self.snapshot[path]}
+        self.snapshot = snapshot
+        return changed
+
+    def wait(self, timeout=None):
+        """
+        Returns the set of changed paths, empty if ``timeout`` passed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        poll = self._poll if self.fd is None else self._read_events
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            step = self.interval if self.fd is None else remaining
+            if self.fd is None and remaining is not None:
+                step = min(step, remaining)
+            changed = poll(step)
+            if changed:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+        while True:
+            more = poll(self.settle)
+            if not more:
+                return changed
+            changed |= more
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.watches = {}
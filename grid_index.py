@@ -0,0 +1,115 @@
+"""
+Index of the assets in a steam grid folder, persisted between runs.
+
+Steam names custom artwork by appid and asset kind:
+
+* ``<appid>p.png`` portrait cover
+* ``<appid>.png`` landscape cover
+* ``<appid>_hero.png`` hero image
+* ``<appid>_logo.png`` logo
+
+The folder is read with ``os.scandir`` and the scan is skipped entirely when
+the modification time of the folder is unchanged. Assets are told apart by
+their file names only, so names already in the index are kept without any
+further system call and only new names are checked.
+"""
+import json
+import os
+import os.path
+import re
+import time
+
+# 2 dropped size, mtime and inode of the files
+INDEX_VERSION = 2
+# 2 seconds, the coarsest timestamps of common filesystems
+MTIME_GRANULARITY = 2 * 10**9
+ASSET_KINDS = {"p": "portrait", "": "landscape", "_hero": "hero", "_logo": "logo"}
+KIND_SUFFIXES = {kind: suffix for suffix, kind in ASSET_KINDS.items()}
+EXTENSIONS = ("png", "jpg", "jpeg", "webp")
+GRID_FILE = re.compile(r"^(\d+)(p|_hero|_logo|)\.(png|jpe?g|webp)$", re.IGNORECASE)
+
+
+def asset_filename(appid, kind, ext):
+    return "{}{}.{}".format(appid, KIND_SUFFIXES[kind], ext.lstrip("."))
+
+
+def parse_filename(filename):
+    """
+    Returns ``(appid, kind)`` of a grid file, None for other files.
+    """
+    match = GRID_FILE.match(filename)
+    if match is None:
+        return None
+    return int(match.group(1)), ASSET_KINDS[match.group(2).lower()]
+
+
+class GridIndex:
+    def __init__(self, gridpath, path):
+        self.gridpath = gridpath
+        self.path = path
+        self.mtime = None
+        # filename: [appid, kind]
+        self.files = {}
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("gridpath") == os.path.abspath(self.gridpath):
+            self.mtime = data["mtime"]
+            self.files = data["files"]
+
+    def save(self):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "gridpath": os.path.abspath(self.gridpath),
+                       "mtime": self.mtime, "files": self.files}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def scan(self):
+        """
+        Brings the index up to date with the folder, returns the number of
+        files that were added or removed since the last scan.
+        """
+        mtime = os.stat(self.gridpath).st_mtime_ns
+        if mtime == self.mtime:
+            return 0
+        files = {}
+        with os.scandir(self.gridpath) as it:
+            for entry in it:
+                if entry.name in self.files:
+                    files[entry.name] = self.files[entry.name]
+                    continue
+                asset = parse_filename(entry.name)
+                if asset is None:
+                    continue
+                try:
+                    # the file type comes with the directory entry on common platforms
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                files[entry.name] = list(asset)
+        changed = len(files.keys() - self.files.keys()) + len(self.files.keys() - files.keys())
+        self.files = files
+        # changes within the timestamp granularity of the folder could go unnoticed
+        self.mtime = mtime if time.time_ns() - mtime > MTIME_GRANULARITY else None
+        return changed
+
+    def find(self, kind="portrait"):
+        """
+        Returns ``{appid: [filename, ...]}`` of all assets of ``kind``.
+        """
+        rst = {}
+        for filename, (appid, file_kind) in self.files.items():
+            if file_kind == kind:
+                rst.setdefault(appid, []).append(filename)
+        return rst
+
+    def remove(self, filename):
+        os.remove(os.path.join(self.gridpath, filename))
+        self.files.pop(filename, None)
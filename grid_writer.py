@@ -0,0 +1,121 @@
+import asyncio
+import os
+import os.path
+from concurrent.futures import ThreadPoolExecutor
+
+
+class GridFile:
+    def __init__(self, writer, path, f):
+        self.writer = writer
+        self.path = path
+        self.tmp_path = path + ".part"
+        self.f = f
+        self.on_commit = None
+        self.on_saved = None
+
+    async def write(self, data):
+        await self.writer.run(self.f.write, data)
+
+
+class GridWriter:
+    """
+    Writes files into the grid folder without blocking the event loop.
+
+    Every file operation runs in a thread pool. Files are written under a
+    ``.part`` name and only renamed into place after they were fsynced, which
+    happens in batches of ``sync_batch`` files and on ``close``. ``store`` is
+    an optional ``CoverStore`` that downloaded covers are shared through,
+    ``normalizer`` an optional ``ImageNormalizer`` for images that need
+    resizing or re-encoding before they are written.
+    """
+    def __init__(self, max_workers=4, sync_batch=32, store=None, normalizer=None):
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.sync_batch = sync_batch
+        self.store = store
+        self.normalizer = normalizer
+        self.pending = []
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def open(self, path):
+        f = await self.run(open, path + ".part", "wb")
+        return GridFile(self, path, f)
+
+    @staticmethod
+    def remove_stale(gridpath):
+        """
+        Removes the ``.part`` files an interrupted run left in ``gridpath``.
+        """
+        with os.scandir(gridpath) as it:
+            for entry in it:
+                if entry.name.endswith(".part") and entry.is_file():
+                    os.remove(entry.path)
+
+    @staticmethod
+    def _remove(gridfile):
+        gridfile.f.close()
+        try:
+            os.remove(gridfile.tmp_path)
+        except FileNotFoundError:
+            pass
+
+    async def discard(self, gridfile):
+        await self.run(self._remove, gridfile)
+
+    async def commit(self, gridfile, on_commit=None, on_saved=None):
+        # on_commit is called from the thread pool once the file is in place, on_saved
+        # from the event loop after its batch was synced. Nothing is saved before that
+        gridfile.on_commit = on_commit
+        gridfile.on_saved = on_saved
+        self.pending.append(gridfile)
+        if len(self.pending) >= self.sync_batch:
+            await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if batch:
+            await self.run(self._sync, batch)
+            for gridfile in batch:
+                if gridfile.on_saved:
+                    gridfile.on_saved()
+
+    @classmethod
+    def _sync(cls, batch):
+        dirs = set()
+        done = 0
+        try:
+            for gridfile in batch:
+                gridfile.f.flush()
+                os.fsync(gridfile.f.fileno())
+                gridfile.f.close()
+                os.replace(gridfile.tmp_path, gridfile.path)
+                done += 1
+                dirs.add(os.path.dirname(gridfile.path))
+                if gridfile.on_commit:
+                    try:
+                        gridfile.on_commit()
+                    except OSError as ex:
+                        print("Error after saving {}: {}".format(gridfile.path, ex))
+        except BaseException:
+            # the rest of the batch is lost, don't leave its temp files in the grid folder
+            for gridfile in batch[done:]:
+                try:
+                    cls._remove(gridfile)
+                except OSError:
+                    pass
+            raise
+        # make the renames durable too, directories can't be opened on windows
+        if os.name == "posix":
+            for dirname in dirs:
+                fd = os.open(dirname or ".", os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    async def close(self):
+        try:
+            await self.flush()
+        finally:
+            self.executor.shutdown()
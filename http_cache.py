@@ -0,0 +1,125 @@
+"""
+On-disk cache of HTTP responses.
+
+Each response is kept as ``<sha1 of url>.body`` with a ``.meta`` json file
+holding the fetch time and the validators sent by the server. The mtime of
+the body file is bumped on every hit and used for LRU eviction.
+"""
+import hashlib
+import json
+import os
+import os.path
+import threading
+import time
+
+
+class HttpCache:
+    def __init__(self, path, ttl=86400, max_size=100*1024*1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.size = None
+        # get and put are called from a thread pool
+        self.lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.path,key)
+        return base + ".body", base + ".meta"
+
+    def get(self, url):
+        """
+        Returns ``(meta, body)`` for ``url``, or ``None`` if it is not cached.
+        """
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path,encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path,"rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        os.utime(body_path)
+        return meta, body
+
+    def is_fresh(self, meta):
+        return time.time() - meta["time"] < self.ttl
+
+    @staticmethod
+    def validators(meta):
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def refresh(self, url, meta):
+        # the server answered 304, the cached body is valid for another ttl
+        meta["time"] = time.time()
+        self._write_meta(url,meta)
+
+    def put(self, url, body, headers):
+        meta = {
+            "url":url,
+            "time":time.time(),
+            "etag":headers.get("ETag"),
+            "last_modified":headers.get("Last-Modified"),
+        }
+        body_path, _ = self._paths(url)
+        os.makedirs(self.path,exist_ok=True)
+        with self.lock:
+            self._put(url,body,meta,body_path)
+
+    def _put(self, url, body, meta, body_path):
+        old_size = os.path.getsize(body_path) if os.path.isfile(body_path) else 0
+        tmp_path = "{}.{}.tmp".format(body_path,threading.get_ident())
+        with open(tmp_path,"wb") as f:
+            f.write(body)
+        os.replace(tmp_path,body_path)
+        self._write_meta(url,meta)
+        if self.size is None:
+            self._scan_size()
+        else:
+            self.size += len(body) - old_size
+        if self.size > self.max_size:
+            self.evict()
+
+    def _write_meta(self, url, meta):
+        _, meta_path = self._paths(url)
+        tmp_path = "{}.{}.tmp".format(meta_path,threading.get_ident())
+        with open(tmp_path,"w",encoding="utf-8") as f:
+            json.dump(meta,f)
+        os.replace(tmp_path,meta_path)
+
+    def _bodies(self):
+        if not os.path.isdir(self.path):
+            return []
+        return [entry for entry in os.scandir(self.path) if entry.name.endswith(".body")]
+
+    @staticmethod
+    def _stat(entry):
+        try:
+            return entry.stat()
+        except OSError:
+            return None
+
+    def _scan_size(self):
+        self.size = sum(st.st_size for st in map(self._stat,self._bodies()) if st)
+
+    def evict(self):
+        # drop least recently used entries until the cache is below 90% of its cap
+        entries = [(entry,st) for entry,st in ((entry,self._stat(entry)) for entry in self._bodies()) if st]
+        entries.sort(key=lambda item:item[1].st_mtime)
+        target = self.max_size * 0.9
+        for entry,st in entries:
+            if self.size <= target:
+                break
+            self.size -= st.st_size
+            for path in (entry.path, entry.path[:-len(".body")] + ".meta"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
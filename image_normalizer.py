@@ -0,0 +1,94 @@
+"""
+Resizes and re-encodes downloaded images in a process pool.
+
+Covers larger than the grid size but with the same aspect ratio are scaled
+down instead of being rejected, and images without transparency can be
+re-encoded as JPEG. Both need Pillow, without it nothing is normalized.
+"""
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# relative difference of aspect ratios still treated as the same
+ASPECT_TOLERANCE = 0.01
+PNG_SIGNATURE = b'\211PNG\r\n\032\n'
+FORMAT_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+
+def target_size(size, sizes):
+    """
+    Returns the size of ``sizes`` an image of ``size`` can be scaled down to,
+    None if there is none with the same aspect ratio.
+    """
+    width, height = size
+    if height == 0:
+        return None
+    candidates = [(w, h) for w, h in sizes
+                  if w <= width and h <= height and abs(w / h - width / height) <= ASPECT_TOLERANCE * (w / h)]
+    return max(candidates, default=None)
+
+
+def normalize_image(data, size=None, jpeg_quality=None):
+    """
+    Scales ``data`` to ``size`` and re-encodes it as JPEG with ``jpeg_quality``
+    unless it has transparency. Returns the image data and its extension.
+    Runs in the worker processes.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as ex:
+        raise ValueError(str(ex))
+    original_ext = FORMAT_EXTENSIONS.get(image.format)
+    if original_ext is None:
+        raise ValueError("Unsupported image format {}".format(image.format))
+    ext = original_ext
+    if size is not None and image.size != tuple(size):
+        image = image.resize(tuple(size), Image.LANCZOS)
+    transparent = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    out = io.BytesIO()
+    if jpeg_quality is not None and not transparent:
+        image.convert("RGB").save(out, "JPEG", quality=jpeg_quality, optimize=True)
+        ext = "jpg"
+    elif size is None:
+        return data, original_ext
+    elif ext == "png":
+        image.save(out, "PNG", optimize=True)
+    elif ext == "webp":
+        image.save(out, "WEBP", quality=95)
+    else:
+        image.convert("RGB").save(out, "JPEG", quality=95)
+    normalized = out.getvalue()
+    # re-encoding alone is only worth it when it saves space
+    if size is None and len(normalized) >= len(data):
+        return data, original_ext
+    return normalized, ext
+
+
+class ImageNormalizer:
+    def __init__(self, max_workers=None, resize=True, jpeg_quality=None):
+        self.resize = resize
+        self.jpeg_quality = jpeg_quality
+        self.executor = ProcessPoolExecutor(max_workers)
+
+    @staticmethod
+    def available():
+        return Image is not None
+
+    def target_size(self, size, sizes):
+        return target_size(size, sizes) if self.resize and sizes else None
+
+    def reencodes(self, data):
+        # only png files get smaller as jpeg
+        return self.jpeg_quality is not None and data.startswith(PNG_SIGNATURE)
+
+    async def normalize(self, data, size=None):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, normalize_image, data, size, self.jpeg_quality)
+
+    def close(self):
+        self.executor.shutdown()
@@ -1,4 +1,11 @@
 from steam.protobufs.steammessages_clientserver_pb2 import CMsgClientLicenseList
+import os
+import os.path
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 NTAB = 32
 IA = 16807
@@ -7,6 +14,9 @@ IQ = 127773
 IR = 2836
 NDIV = (1+(IM-1)//NTAB)
 MAX_RANDOM_RANGE = 0x7FFFFFFF
+CHAR_LOW = 32
+CHAR_HIGH = 126
+BLOCK_SIZE = 0x10000
 class RandomStream:
     def __init__(self):
         self.set_seed(0)
@@ -16,20 +26,23 @@ class RandomStream:
         self.m_iy = 0
         self.m_iv = [0 for _ in range(NTAB)] 
 
+    def init_table(self):
+        if -(self.m_idum) < 1:
+            self.m_idum = 1
+        else:
+            self.m_idum = -(self.m_idum)
+        for j in range(NTAB+7,-1,-1):
+            k = (self.m_idum)//IQ
+            self.m_idum = IA*(self.m_idum-k*IQ)-IR*k
+            if self.m_idum < 0:
+                self.m_idum += IM
+            if j < NTAB:
+                self.m_iv[j] = self.m_idum
+        self.m_iy=self.m_iv[0]
+
     def generate_random_number(self):
         if self.m_idum <= 0 or not self.m_iy:
-            if -(self.m_idum) < 1:
-                self.m_idum = 1
-            else:
-                self.m_idum = -(self.m_idum)
-            for j in range(NTAB+7,-1,-1):
-                k = (self.m_idum)//IQ
-                self.m_idum = IA*(self.m_idum-k*IQ)-IR*k
-                if self.m_idum < 0:
-                    self.m_idum += IM
-                if j < NTAB:
-                    self.m_iv[j] = self.m_idum
-            self.m_iy=self.m_iv[0]
+            self.init_table()
 	
         k=(self.m_idum)//IQ
         self.m_idum=IA*(self.m_idum-k*IQ)-IR*k
@@ -61,24 +74,102 @@ class RandomStream:
     def random_char(self):
         return self.random_int(32,126)
 
+    def generate_idum_block(self, count):
+        # the lcg part of the generator does not depend on the shuffle table,
+        # so a block of it can be computed at once as idum * IA^i mod IM
+        if numpy is not None:
+            block = (_idum_powers()[:count] * self.m_idum) % IM
+            self.m_idum = int(block[-1])
+            return block.tolist()
+        block = []
+        idum = self.m_idum
+        for _ in range(count):
+            idum = idum*IA % IM
+            block.append(idum)
+        self.m_idum = idum
+        return block
+
+    def random_chars(self, length):
+        """
+        Returns the next ``length`` values of ``random_char`` as ``bytes``.
+        """
+        if self.m_idum <= 0 or not self.m_iy:
+            self.init_table()
+
+        x = CHAR_HIGH-CHAR_LOW+1
+        maxAcceptable = MAX_RANDOM_RANGE - ((MAX_RANDOM_RANGE+1) % x )
+        result = bytearray(length)
+        iy = self.m_iy
+        iv = self.m_iv
+        i = 0
+        while i < length:
+            # a few numbers get rejected, so blocks may need topping up
+            for idum in self.generate_idum_block(min(length-i,BLOCK_SIZE)):
+                # iy < IM, so j is always within NTAB
+                j = iy//NDIV
+                iy = iv[j]
+                iv[j] = idum
+                if iy <= maxAcceptable:
+                    result[i] = CHAR_LOW + iy % x
+                    i += 1
+        self.m_iy = iy
+        return bytes(result)
+
     def decrypt_data(self, key, data):
         self.set_seed(key)
-        result = bytearray(data)
-        for i in range(len(data)):
-            byte = self.random_char()
-            #if i >= 0x6c5a0:
-            #    print(hex(byte))
-            result[i] = data[i] ^ byte
-        return result
-
-def parse(path, steamid):
+        keystream = self.random_chars(len(data))
+        if numpy is not None:
+            return bytearray(numpy.bitwise_xor(numpy.frombuffer(data,dtype=numpy.uint8),
+                                               numpy.frombuffer(keystream,dtype=numpy.uint8)).tobytes())
+        result = int.from_bytes(data,'little') ^ int.from_bytes(keystream,'little')
+        return bytearray(result.to_bytes(len(data),'little'))
+
+_idum_power_table = None
+
+def _idum_powers():
+    # IA^i mod IM for i in 1..BLOCK_SIZE
+    global _idum_power_table
+    if _idum_power_table is None:
+        powers = []
+        power = 1
+        for _ in range(BLOCK_SIZE):
+            power = power*IA % IM
+            powers.append(power)
+        _idum_power_table = numpy.array(powers,dtype=numpy.int64)
+    return _idum_power_table
+
+def parse(path, steamid, cache_path=None):
+    """
+    Decrypts and parses a licensecache file. If ``cache_path`` is given the
+    decrypted message is stored there and reused while the size and mtime of
+    the licensecache and the steamid stay the same.
+    """
     with open(path,'rb') as f:
+        # the key is taken from the open file, so it matches the content read below
+        stat = os.fstat(f.fileno())
+        cache_key = "{} {} {}\n".format(stat.st_size,stat.st_mtime_ns,steamid).encode()
+        msg = CMsgClientLicenseList()
+        if cache_path and os.path.isfile(cache_path):
+            with open(cache_path,'rb') as cache:
+                cached = cache.read()
+            if cached.startswith(cache_key):
+                msg.ParseFromString(cached[len(cache_key):])
+                return msg
         encrypted = f.read()
 
     random = RandomStream()
     decrypted = random.decrypt_data(steamid, encrypted)
 
-    msg = CMsgClientLicenseList()
-    msg.ParseFromString(bytes(decrypted[:-4]))
+    serialized = bytes(decrypted[:-4])
+    msg.ParseFromString(serialized)
+    if cache_path:
+        dirname = os.path.dirname(cache_path)
+        if dirname:
+            os.makedirs(dirname,exist_ok=True)
+        # an interrupted write must not leave a cache file with a valid key
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path,'wb') as f:
+            f.write(cache_key + serialized)
+        os.replace(tmp_path,cache_path)
     return msg
 
@@ -0,0 +1,128 @@
+"""
+Timings, counters and histograms of a run, exported as json or as a
+Prometheus textfile for the node exporter textfile collector.
+"""
+import json
+import os
+import os.path
+import time
+from contextlib import contextmanager
+
+PREFIX = "missing_cover_"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def _format_labels(labels, extra=()):
+    labels = list(labels) + list(extra)
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    def to_dict(self):
+        return {
+            "started": self.started,
+            "phases": self.phases,
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(self.counters.items())],
+            "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                       for (name, labels), value in sorted(self.gauges.items())],
+            "histograms": [{"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                            "buckets": dict(zip(map(str, h.buckets), h.counts))}
+                           for (name, labels), h in sorted(self.histograms.items())],
+        }
+
+    def to_prometheus(self):
+        lines = ["# TYPE {}phase_seconds gauge".format(PREFIX)]
+        for name, seconds in sorted(self.phases.items()):
+            lines.append('{}phase_seconds{{phase="{}"}} {}'.format(PREFIX, name, seconds))
+        lines.append("# TYPE {}last_run_timestamp_seconds gauge".format(PREFIX))
+        lines.append("{}last_run_timestamp_seconds {}".format(PREFIX, self.started))
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                lines.append("# TYPE {}{} counter".format(PREFIX, name))
+                typed.add(name)
+            lines.append("{}{}{} {}".format(PREFIX, name, _format_labels(labels), value))
+        for (name, labels), value in sorted(self.gauges.items()):
+            if name not in typed:
+                lines.append("# TYPE {}{} gauge".format(PREFIX, name))
+                typed.add(name)
+            lines.append("{}{}{} {}".format(PREFIX, name, _format_labels(labels), value))
+        for (name, labels), h in sorted(self.histograms.items()):
+            if name not in typed:
+                lines.append("# TYPE {}{} histogram".format(PREFIX, name))
+                typed.add(name)
+            for bound, count in zip(h.buckets, h.counts):
+                lines.append("{}{}_bucket{} {}".format(PREFIX, name, _format_labels(labels, [("le", bound)]), count))
+            lines.append("{}{}_bucket{} {}".format(PREFIX, name, _format_labels(labels, [("le", "+Inf")]), h.count))
+            lines.append("{}{}_sum{} {}".format(PREFIX, name, _format_labels(labels), h.sum))
+            lines.append("{}{}_count{} {}".format(PREFIX, name, _format_labels(labels), h.count))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _write(path, text):
+        # the textfile collector may read at any time, so replace the file atomically
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+
+    def write_json(self, path):
+        self._write(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path):
+        self._write(path, self.to_prometheus())
+
+
+METRICS = Metrics()
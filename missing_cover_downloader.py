@@ -2,18 +2,35 @@ from steam.client import SteamClient
 from steam.steamid import SteamID
 from steam.webapi import WebAPI
 from steam.enums import EResult
+from gevent.pool import Pool
 import sys, os, os.path
 import platform
-import re
+import time
+import random
 import json
 import urllib.request
 import struct
+import mmap
 import traceback
 import vdf
 import argparse
+import atexit
 import asyncio
 import aiohttp
 import license_parser
+import coverdb
+import pics_store
+from download_journal import DownloadJournal
+from file_watcher import FileWatcher
+from grid_index import GridIndex, EXTENSIONS, asset_filename
+from metrics import METRICS
+from http_cache import HttpCache
+from grid_writer import GridWriter
+from image_normalizer import ImageNormalizer
+from cover_store import CoverStore, clone_file
+from concurrency import ConcurrencyController
+from rate_limiter import RateLimiter, BudgetExceeded, parse_retry_after
+from appinfo_cache import AppinfoCache, PROJECTION_PATHS
 
 OS_TYPE = platform.system()
 if OS_TYPE == "Windows":
@@ -31,30 +48,75 @@ STEAM_APPINFO =  "{}/appcache/appinfo.vdf"
 STEAM_PACKAGEINFO = "{}/appcache/packageinfo.vdf"
 STEAM_CLIENTCONFIG = "{}/userdata/{}/7/remote/sharedconfig.vdf"
 STEAM_USERCONFIG = "{}/userdata/{}/config/localconfig.vdf"
+CACHE_DIR = "cache"
+APPINFO_CACHE = os.path.join(CACHE_DIR,"appinfo_cache.json")
+PARALLEL_DECODE_THRESHOLD = 2000
+MISSING_COVER_DB_JSON = "missingcoverdb.json"
+MISSING_COVER_DB = os.path.join(CACHE_DIR,"missingcoverdb.bin")
+PICS_STORE = os.path.join(CACHE_DIR,"pics_store.json")
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR,"http")
+JOURNAL = os.path.join(CACHE_DIR,"journal_{}.jsonl")
+COVER_STORE_DIR = os.path.join(CACHE_DIR,"covers")
+GRID_INDEX = os.path.join(CACHE_DIR,"grid_index_{}.json")
+KEEPALIVE_TIMEOUT = 30
+# steamgriddb endpoint, query and accepted image sizes of every asset kind, logos come in any size.
+# official is the key path below the common section of appinfo that holds the official asset
+ASSET_TYPES = {
+    "portrait": {"endpoint":"grids","query":"dimensions=600x900","sizes":{(600,900)},
+                 "official":("library_assets","library_capsule")},
+    "landscape": {"endpoint":"grids","query":"dimensions=920x430,460x215","sizes":{(920,430),(460,215)},
+                  "official":("header_image",)},
+    "hero": {"endpoint":"heroes","query":"dimensions=1920x620,3840x1240,1600x650","sizes":{(1920,620),(3840,1240),(1600,650)},
+             "official":("library_assets","library_hero")},
+    "logo": {"endpoint":"logos","query":"","sizes":None,
+             "official":("library_assets","library_logo")},
+}
 
 
 def split_list(l,n):
     for i in range(0,len(l),n):
         yield l[i:i+n]
     
-def retry_func(func,errorhandler=print,retry=3):
-    for _ in range(retry):
+def map_file(path):
+    with open(path,"rb") as f:
+        try:
+            return mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can not be mapped
+            return f.read()
+    
+def retry_func(func,errorhandler=print,retry=3,backoff=0,sleep=time.sleep):
+    for attempt in range(retry):
         try:
             rst = func()
             return rst,True
         except Exception as ex:
             errorhandler(ex)
+            if backoff and attempt < retry - 1:
+                sleep(backoff * 2 ** attempt)
             continue
     return None,False
 
 
-async def retry_func_async(func,errorhandler=print,retry=3):
-    for _ in range(retry):
+async def run_blocking(func,*args):
+    # file io of the caches runs in the default thread pool, off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None,func,*args)
+
+async def retry_func_async(func,errorhandler=print,retry=3,backoff=0):
+    for attempt in range(retry):
         try:
             rst = await func()
             return rst,True
+        except BudgetExceeded:
+            raise
         except Exception as ex:
             errorhandler(ex)
+            if attempt < retry - 1:
+                # the last failed attempt is not followed by a retry
+                METRICS.inc("retries_total")
+                if backoff:
+                    # jitter keeps concurrent retries from hitting the server in lockstep
+                    await asyncio.sleep(random.uniform(0,backoff * 2 ** attempt))
             continue
     return None,False
     
@@ -89,10 +151,19 @@ class SteamDataReader(object):
         return list(rst)
 
 
-    def get_missing_cover_dict_from_app_details(self,apps):  
+    @staticmethod
+    def has_official_asset(common,kind="portrait"):
+        value = common
+        for key in ASSET_TYPES[kind]["official"]:
+            if not isinstance(value,dict) or key not in value:
+                return False
+            value = value[key]
+        return True
+
+    def get_missing_cover_dict_from_app_details(self,apps,kind="portrait"):  
         rst = {}
         for appid,app in apps.items():
-            if "common" in app and app["common"]["type"].lower() == "game" and not "library_assets" in app["common"]:
+            if "common" in app and app["common"]["type"].lower() == "game" and not self.has_official_asset(app["common"],kind):
                 rst[int(appid)] = app["common"]["name"]
         return rst
 
@@ -102,58 +173,134 @@ class SteamDataReader(object):
     def get_package_details(self,apps):
         return {}
 
-    def get_owned_packages(self):
+    def get_owned_packages(self,steamid=None):
         return []
+
+    def close(self):
+        pass
     
-    def get_missing_cover_app_dict(self,usedb=True):
+    def get_missing_cover_app_dict(self,usedb=True,steamid=None,kinds=("portrait",)):
+        # returns the games missing official assets of each of kinds, the database only knows portrait covers
         
-        owned_packageids = self.get_owned_packages()
+        with METRICS.phase("license_parse"):
+            owned_packageids = self.get_owned_packages(steamid)
         print("Total packages in library:",len(owned_packageids))
         print("Retriving package details")
-        owned_packages = self.get_package_details(owned_packageids)
-        print("Retriving apps in packages")
-        owned_appids = self.get_appids_from_packages(owned_packages)
+        with METRICS.phase("package_resolution"):
+            owned_packages = self.get_package_details(owned_packageids)
+            print("Retriving apps in packages")
+            owned_appids = self.get_appids_from_packages(owned_packages)
         print("Total apps in library:",len(owned_appids))
-        if usedb and os.path.exists("missingcoverdb.json"):
-            with open("missingcoverdb.json",encoding="utf-8") as f:
-                missing_cover_apps = {int(appid):value for appid,value in json.load(f).items()}
-            print("Loaded database with {} apps missing covers".format(len(missing_cover_apps)))
-            owned_appids = set(owned_appids)
-            return {appid:value for appid,value in missing_cover_apps if appid in owned_appids}
-        else:
+        labels = {"account":steamid.as_32} if steamid is not None else {}
+        METRICS.set("owned_packages",len(owned_packageids),**labels)
+        METRICS.set("owned_apps",len(owned_appids),**labels)
+        rst = {}
+        if "portrait" in kinds and usedb and (os.path.exists(MISSING_COVER_DB_JSON) or os.path.exists(MISSING_COVER_DB)):
+            with METRICS.phase("db_load"):
+                try:
+                    db = coverdb.load(MISSING_COVER_DB,MISSING_COVER_DB_JSON)
+                except ValueError as ex:
+                    # without the json the database can't be rebuilt, the app details are used instead
+                    print(ex)
+                    db = None
+                if db is not None:
+                    print("Loaded database with {} apps missing covers".format(len(db)))
+                    try:
+                        rst["portrait"] = db.intersect(owned_appids)
+                    finally:
+                        db.close()
+        other_kinds = [kind for kind in kinds if kind not in rst]
+        if other_kinds:
             print("Retriving app details")
-            owned_apps = self.get_app_details(owned_appids)
-            return self.get_missing_cover_dict_from_app_details(owned_apps)
+            with METRICS.phase("app_resolution"):
+                owned_apps = self.get_app_details(owned_appids)
+                for kind in other_kinds:
+                    rst[kind] = self.get_missing_cover_dict_from_app_details(owned_apps,kind)
+        return rst
             
 
 class SteamDataReaderRemote(SteamDataReader):
 
-    def __init__(self,client,request_batch=200):
+    def __init__(self,client,request_batch=200,concurrency=4,backoff=1):
         self.client = client
         self.request_batch = request_batch
+        self.concurrency = concurrency
+        self.backoff = backoff
+        self.store = pics_store.PicsStore(PICS_STORE)
+        self.synced = False
 
     def get_steam_id(self):
         return self.client.steam_id
 
-    def get_app_details(self,appids):
-        rst = {}
-        for i,sublist in enumerate(split_list(appids,self.request_batch)):
-            print("Loading app details: {}-{}".format(i*self.request_batch+1,i*self.request_batch+len(sublist)))
-            subrst, success = retry_func(lambda: self.client.get_product_info(sublist))
+    def sync_store(self):
+        # drop stored entries that changed since the stored change number
+        if self.synced:
+            return
+        self.synced = True
+        self.store.load()
+        since = self.store.change_number
+        changes = self.client.get_changes_since(since,app_changes=True,package_changes=True)
+        if changes is None:
+            print("Failed to retrieve product info changes, reloading all details")
+            self.store.clear()
+            return
+        if since == 0 or changes.force_full_update:
+            self.store.clear()
+        else:
+            if changes.force_full_app_update:
+                self.store.apps.clear()
+            else:
+                for change in changes.app_changes:
+                    self.store.apps.pop(change.appid,None)
+            if changes.force_full_package_update:
+                self.store.packages.clear()
+            else:
+                for change in changes.package_changes:
+                    self.store.packages.pop(change.packageid,None)
+        print("Product info changes since {}: {} apps, {} packages".format(
+            since,len(changes.app_changes),len(changes.package_changes)))
+        self.store.change_number = changes.current_change_number
+        if self.store.change_number != since:
+            # saved even when nothing has to be loaded, the next run would fetch the same changes again
+            self.store.save()
+
+    def get_product_info(self,ids,kind):
+        # kind is either 'apps' or 'packages', only entries missing from the store are
+        # requested, batches are requested concurrently on gevent greenlets
+        self.sync_store()
+        stored = getattr(self.store,kind)
+        missing_ids = [entry_id for entry_id in ids if entry_id not in stored]
+        print("Stored {} details up to date: {}, to load: {}".format(kind[:-1],len(ids)-len(missing_ids),len(missing_ids)))
+
+        def fetch(batch):
+            i, sublist = batch
+            start = i*self.request_batch+1
+            print("Loading {} details: {}-{}".format(kind[:-1],start,start+len(sublist)-1))
+            subrst, success = retry_func(lambda: self.client.get_product_info(**{kind:sublist}),
+                                         lambda ex: print("Error loading {} details {}-{}: {}, retry".format(kind[:-1],start,start+len(sublist)-1,ex)),
+                                         backoff=self.backoff,sleep=self.client.sleep)
+            return start, sublist, subrst, success
+
+        pool = Pool(self.concurrency)
+        for start, sublist, subrst, success in pool.imap_unordered(fetch,enumerate(split_list(missing_ids,self.request_batch))):
             if success:
-                rst.update(subrst['apps'])
-        return rst
+                for entry_id, data in subrst[kind].items():
+                    # apps are only used to find missing covers
+                    stored[entry_id] = pics_store.project(data,PROJECTION_PATHS) if kind == 'apps' else data
+            else:
+                print("Failed to load {} details {}-{}".format(kind[:-1],start,start+len(sublist)-1))
+        if missing_ids:
+            self.store.save()
+        return {entry_id:stored[entry_id] for entry_id in ids if entry_id in stored}
+
+    def get_app_details(self,appids):
+        return self.get_product_info(appids,'apps')
     
     def get_package_details(self,pkgids):
-        rst = {}
-        for i,sublist in enumerate(split_list(pkgids,self.request_batch)):
-            print("Loading package details: {}-{}".format(i*self.request_batch+1,i*self.request_batch+len(sublist)))
-            subrst, success = retry_func(lambda: self.client.get_product_info([],sublist))
-            if success:
-                rst.update(subrst['packages'])
-        return rst
+        return self.get_product_info(pkgids,'packages')
 
-    def get_owned_packages(self):
+    def get_owned_packages(self,steamid=None):
+        # only the logged in account is available remotely
         timeout = 30
         for _ in range(timeout):
             if len(self.client.licenses) == 0:
@@ -164,10 +311,12 @@ class SteamDataReaderRemote(SteamDataReader):
 
 class SteamDataReaderLocal(SteamDataReader):
 
-    def __init__(self,steampath):
+    def __init__(self,steampath,workers=1):
         self.steam_path = steampath
+        self.workers = workers
         self.appinfo = None
         self.packageinfo = None
+        self.appinfo_cache = AppinfoCache(APPINFO_CACHE)
 
     def get_steam_id(self):
         loginuser_path = STEAM_LOGINUSER.format(self.steam_path)
@@ -180,17 +329,44 @@ class SteamDataReaderLocal(SteamDataReader):
             elif len(login_steamids) == 0:
                 return SteamID()
             else:
-                for id,value in login_user.items():
-                    if value.get("mostrecent") == 1:
-                        return int(id)
+                for id,value in login_user['users'].items():
+                    if {k.lower():v for k,v in value.items()}.get("mostrecent") == "1":
+                        return SteamID(int(id))
                 return SteamID(int(login_steamids[0]))
+
+    def get_steam_ids(self):
+        # every account that logged in on this machine and has a license cache
+        loginuser_path = STEAM_LOGINUSER.format(self.steam_path)
+        if not os.path.isfile(loginuser_path):
+            return []
+        with open(loginuser_path,'r',encoding='utf-8') as f:
+            login_user = vdf.load(f)
+        steamids = [SteamID(int(id)) for id in login_user['users'].keys()]
+        return [steamid for steamid in steamids
+                if os.path.isfile(f"{self.steam_path}/userdata/{steamid.as_32}/config/licensecache")]
         
     def get_app_details(self,appids):
         if not self.appinfo:
             print("Loading appinfo.vdf")
             self.appinfo = self.load_appinfo()
             print("Total apps in local cache",len(self.appinfo))
-        return {appid:self.appinfo[appid] for appid in appids if appid in self.appinfo}
+            self.appinfo_cache.load()
+        # only the fields needed by get_missing_cover_dict_from_app_details are returned,
+        # apps are decoded only when their change number differs from the cached one
+        appids = [appid for appid in appids if appid in self.appinfo]
+        stale_appids = [appid for appid in appids
+                        if self.appinfo_cache.get(appid,self.appinfo.change_number(appid)) is None]
+        print("Apps to decode from appinfo.vdf:",len(stale_appids))
+        if self.workers > 1 and len(stale_appids) >= PARALLEL_DECODE_THRESHOLD:
+            print("Decoding appinfo.vdf with {} workers".format(self.workers))
+            decoded_apps = vdf.appinfo_parallel_load(STEAM_APPINFO.format(self.steam_path),self.workers,stale_appids,PROJECTION_PATHS)
+        else:
+            decoded_apps = {appid:self.appinfo.project(appid,PROJECTION_PATHS) for appid in stale_appids}
+        for appid in stale_appids:
+            self.appinfo_cache.update(appid,self.appinfo.change_number(appid),decoded_apps[appid])
+        rst = {appid:AppinfoCache.to_app_details(self.appinfo_cache.apps[appid]) for appid in appids}
+        self.appinfo_cache.save()
+        return rst
 
     def get_package_details(self,packageids):
         if not self.packageinfo:
@@ -199,26 +375,32 @@ class SteamDataReaderLocal(SteamDataReader):
             print("Total packages in local cache",len(self.packageinfo))
         return {packageid:self.packageinfo[packageid] for packageid in packageids if packageid in self.packageinfo}
 
+    def close(self):
+        # the maps keep the appcache files open, on windows steam then can't replace them.
+        # They are closed once apps and packages are resolved and mapped again when used next
+        for info in (self.appinfo,self.packageinfo):
+            if info is not None:
+                info.close()
+        self.appinfo = None
+        self.packageinfo = None
+
     def load_appinfo(self):
         appinfo_path = STEAM_APPINFO.format(self.steam_path)
         if not os.path.isfile(appinfo_path):
             raise FileNotFoundError("appinfo.vdf not found")
-        with open(appinfo_path,"rb") as f:
-            appinfo = vdf.appinfo_loads(f.read())
-        return appinfo
+        return vdf.appinfo_lazy_loads(map_file(appinfo_path))
 
     def load_packageinfo(self):
         package_info_path = STEAM_PACKAGEINFO.format(self.steam_path)
         if not os.path.isfile(package_info_path):
             raise FileNotFoundError("packageinfo.vdf not found")
-        with open(package_info_path,"rb") as f:
-            packageinfo = vdf.packageinfo_loads(f.read())
-        return packageinfo
+        return vdf.packageinfo_lazy_loads(map_file(package_info_path))
 
-    def get_owned_packages(self):
-        steamid32 = self.get_steam_id().as_32
+    def get_owned_packages(self,steamid=None):
+        steamid32 = (steamid or self.get_steam_id()).as_32
         license_cache_path = f"{self.steam_path}/userdata/{steamid32}/config/licensecache"
-        licenses = license_parser.parse(license_cache_path, steamid32).licenses
+        cache_path = os.path.join(CACHE_DIR,"licensecache_{}.bin".format(steamid32))
+        licenses = license_parser.parse(license_cache_path, steamid32, cache_path).licenses
         #local_config_path = STEAM_USERCONFIG.format(self.steam_path,self.get_steam_id().as_32)
         #with open(local_config_path,'r',encoding='utf-8',errors='replace') as f:
         #    local_config = vdf.load(f)
@@ -227,18 +409,50 @@ class SteamDataReaderLocal(SteamDataReader):
     
 
 
-async def query_cover_for_apps(appid,session,styles=None):
-    url = "https://www.steamgriddb.com/api/v2/grids/steam/{}?dimensions=600x900".format(','.join(appid) if isinstance(appid, list) else appid)
-    if styles:
+def cover_query_url(appid,styles=None,kind="portrait"):
+    asset_type = ASSET_TYPES[kind]
+    url = "https://www.steamgriddb.com/api/v2/{}/steam/{}?{}".format(asset_type["endpoint"],appid,asset_type["query"])
+    # styles differ between endpoints, the ones given are for grids
+    if styles and asset_type["endpoint"] == "grids":
         url = f'{url}&styles={styles}'
-    jsondata = await fetch_url(url,session,'json',headers={"Authorization": "Bearer {}".format(SGDB_API_KEY)})
-    if isinstance(appid, list) and jsondata['success']:
-        jsondata['data'] = zip(appid, jsondata['data'])
-    return jsondata
+    return url
 
-async def query_sgdbid_for_appid(appid,session):
+async def query_cover_for_apps(appid,session,styles=None,cache=None,limiter=None,kind="portrait"):
+    headers = {"Authorization": "Bearer {}".format(SGDB_API_KEY)}
+    if not isinstance(appid, list):
+        return await fetch_url(cover_query_url(appid,styles,kind),session,'json',cache,limiter,headers=headers)
+    # batches are cached per app under the url of the single app query, so they are
+    # answered from the cache even when the apps of a batch differ from the last run
+    results = {}
+    if cache:
+        for app_id in appid:
+            cached = await run_blocking(cache.get,cover_query_url(app_id,styles,kind))
+            if cached and cache.is_fresh(cached[0]):
+                results[app_id] = json.loads(cached[1])
+        METRICS.inc("http_cache_hits_total",len(results))
+    query_ids = [app_id for app_id in appid if app_id not in results]
+    if len(query_ids) == 1:
+        # the api only returns per app results for more than one app. An app it doesn't
+        # know is answered with 404, which must not fail the cached results of the batch
+        try:
+            results[query_ids[0]] = await fetch_url(cover_query_url(query_ids[0],styles,kind),session,'json',cache,limiter,headers=headers)
+        except aiohttp.ClientResponseError as ex:
+            if ex.status != 404:
+                raise
+            results[query_ids[0]] = {'success':False,'errors':[ex.message or 'Not found']}
+    elif query_ids:
+        jsondata = await fetch_url(cover_query_url(','.join(query_ids),styles,kind),session,'json',None,limiter,headers=headers)
+        if not jsondata['success']:
+            return jsondata
+        for app_id, rst in zip(query_ids, jsondata['data']):
+            results[app_id] = rst
+            if cache and rst.get('success'):
+                await run_blocking(cache.put,cover_query_url(app_id,styles,kind),json.dumps(rst).encode('utf-8'),{})
+    return {'success':True,'data':[(app_id,results[app_id]) for app_id in appid]}
+
+async def query_sgdbid_for_appid(appid,session,cache=None,limiter=None):
     url = "https://www.steamgriddb.com/api/v2/games/steam/{}".format(appid)
-    jsondata = await fetch_url(url,session,'json',headers={"Authorization": "Bearer {}".format(SGDB_API_KEY)})
+    jsondata = await fetch_url(url,session,'json',cache,limiter,headers={"Authorization": "Bearer {}".format(SGDB_API_KEY)})
     return jsondata
 
 def quick_get_image_size(data):
@@ -277,131 +491,485 @@ def quick_get_image_size(data):
             height, width = struct.unpack('>HH', data[index:index+4])
         except struct.error:
             raise ValueError("Invalid JPEG file")
+    # handle WebPs
+    elif size >= 12 and data.startswith(b'RIFF') and data[8:12] == b'WEBP':
+        try:
+            width, height = webp_image_size(data)
+        except (struct.error, IndexError):
+            raise ValueError("Invalid WebP file")
     else:
             raise ValueError("Unsupported format")
  
     return width, height    
 
 
+def webp_image_size(data):
+    # the first chunk after the RIFF header holds the size, in one of three layouts
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        # lossy, 14 bit sizes after the frame tag and start code of the key frame
+        if data[23:26] != b'\x9d\x01\x2a':
+            raise ValueError("Invalid WebP file")
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3fff, height & 0x3fff
+    if chunk == b'VP8L':
+        # lossless, 14 bit sizes minus one after the signature byte
+        if data[20] != 0x2f:
+            raise ValueError("Invalid WebP file")
+        bits = struct.unpack('<I', data[21:25])[0]
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == b'VP8X':
+        # extended, 24 bit canvas sizes minus one after the flags
+        if len(data) < 30:
+            raise IndexError("Truncated WebP header")
+        return int.from_bytes(data[24:27],'little') + 1, int.from_bytes(data[27:30],'little') + 1
+    raise ValueError("Invalid WebP file")
+
+
+def sniff_image_size(data):
+    """
+    Returns the size of a partially downloaded image, or None if more data is
+    needed to tell. Raises ValueError if the data is not a PNG, JPEG or WebP.
+    """
+    png_signature = b'\211PNG\r\n\032\n'
+    jpeg_signature = b'\377\330'
+    webp = b'RIFF'.startswith(data[:4]) and b'WEBP'.startswith(data[8:12])
+    if not (png_signature.startswith(data[:8]) or jpeg_signature.startswith(data[:2]) or webp):
+        raise ValueError("Unsupported format")
+    if webp:
+        # all three header layouts fit in 30 bytes
+        if len(data) < 30:
+            return None
+        return quick_get_image_size(data)
+    if data.startswith(png_signature):
+        # the IHDR chunk always comes first
+        if len(data) < 24:
+            return None
+        return quick_get_image_size(data)
+    if len(data) < 2:
+        return None
+    try:
+        return quick_get_image_size(data)
+    except (IndexError, ValueError):
+        # the SOFn marker has not arrived yet
+        return None
+
 
-async def fetch_url(url, session:aiohttp.ClientSession,returntype='bin',**kwargs):
+
+async def request_url(url, session:aiohttp.ClientSession,limiter:RateLimiter=None,**kwargs):
+    if limiter:
+        await limiter.acquire()
+    start = time.perf_counter()
     resp = await session.get(url,**kwargs)
-    resp.raise_for_status()
+    METRICS.observe("http_request_seconds",time.perf_counter() - start,kind="api")
+    METRICS.inc("http_requests_total",kind="api",status=resp.status)
+    if resp.status == 429:
+        METRICS.inc("http_throttled_total",kind="api")
+    if limiter:
+        if resp.status == 429:
+            limiter.on_throttled(parse_retry_after(resp.headers.get('Retry-After')))
+        elif resp.status >= 500:
+            limiter.on_error()
+        else:
+            limiter.on_success()
+    return resp
+
+
+async def fetch_url(url, session:aiohttp.ClientSession,returntype='bin',cache:HttpCache=None,limiter:RateLimiter=None,**kwargs):
+    if returntype not in ('bin','html','json'):
+        raise ValueError("Unsupported return type")
+    if cache is None:
+        resp = await request_url(url,session,limiter,**kwargs)
+        resp.raise_for_status()
+        data = await resp.read()
+        METRICS.inc("http_bytes_total",len(data),kind="api")
+        if returntype == 'bin':
+            return data
+        elif returntype == 'html':
+            return await resp.text()
+        return await resp.json()
+
+    cached = await run_blocking(cache.get,url)
+    if cached and cache.is_fresh(cached[0]):
+        METRICS.inc("http_cache_hits_total")
+        data = cached[1]
+    else:
+        if cached:
+            kwargs['headers'] = {**kwargs.get('headers',{}),**HttpCache.validators(cached[0])}
+        resp = await request_url(url,session,limiter,**kwargs)
+        if cached and resp.status == 304:
+            METRICS.inc("http_cache_revalidated_total")
+            await run_blocking(cache.refresh,url,cached[0])
+            data = cached[1]
+        else:
+            resp.raise_for_status()
+            data = await resp.read()
+            METRICS.inc("http_bytes_total",len(data),kind="api")
+            # failed api answers are not worth keeping
+            if returntype != 'json' or json.loads(data).get('success',True) is not False:
+                await run_blocking(cache.put,url,data,resp.headers)
     if returntype == 'bin':
-        return await resp.read()
+        return data
     elif returntype == 'html':
-        return await resp.text()
-    elif returntype == 'json':
-        return await resp.json()
-    raise ValueError("Unsupported return type")
+        return data.decode('utf-8','replace')
+    return json.loads(data)
+
+
+def read_file(path):
+    with open(path,'rb') as f:
+        return f.read()
+
+
+async def stream_image(url,gridpath,appid,session,writer:GridWriter,chunk_size=65536,kind="portrait",on_saved=None):
+    # the size is checked on the first chunks, wrong sized images are dropped
+    # before the rest is transferred and accepted ones are written as they arrive.
+    # gridpath can be a list of grid paths of several accounts, the image is
+    # downloaded into the first one and cloned into the others. Images that are
+    # resized or re-encoded by the normalizer are kept in memory until complete.
+    # on_saved is called once the file is in place, which can be after returning
+    gridpaths = [gridpath] if isinstance(gridpath,str) else gridpath
+    sizes = ASSET_TYPES[kind]["sizes"]
+    normalizer = writer.normalizer
+    filename = asset_filename(appid,kind,os.path.splitext(url)[1])
+    path = os.path.join(gridpaths[0],filename)
+    other_paths = [os.path.join(p,filename) for p in gridpaths[1:]]
+    stored = writer.store.get(url) if writer.store else None
+    target = None
+
+    def remove_other_extensions():
+        # steam picks one of the files of an asset, an older one with another extension must go
+        for p in gridpaths:
+            for ext in EXTENSIONS:
+                other = asset_filename(appid,kind,ext)
+                if other != filename:
+                    try:
+                        os.remove(os.path.join(p,other))
+                    except FileNotFoundError:
+                        pass
+
+    async def from_store():
+        for p in [path] + other_paths:
+            await writer.run(writer.store.materialize,url,p)
+        await writer.run(remove_other_extensions)
+        print("Saved to {} from cover store".format(filename))
+        METRICS.inc("cover_store_hits_total")
+        if on_saved:
+            on_saved()
+        return True
+
+    def accept(size):
+        nonlocal target
+        if sizes and size not in sizes:
+            target = normalizer.target_size(size,sizes) if normalizer else None
+            if target is None:
+                print("Image size incorrect:",*size)
+                METRICS.inc("images_rejected_size_total")
+                return False
+        return True
+
+    if stored and normalizer is None:
+        return await from_store()
+    resp = None
+    if not stored:
+        start = time.perf_counter()
+        resp = await session.get(url)
+        METRICS.observe("http_request_seconds",time.perf_counter() - start,kind="image")
+        METRICS.inc("http_requests_total",kind="image",status=resp.status)
+
+    try:
+        head = b''
+        size = None
+        f = None
+        buffered = False
+        try:
+            if stored:
+                # stored images are as served and still go through the normalizer
+                head = await writer.run(read_file,stored)
+            else:
+                resp.raise_for_status()
+                async for chunk in resp.content.iter_chunked(chunk_size):
+                    METRICS.inc("http_bytes_total",len(chunk),kind="image")
+                    if f is not None:
+                        await f.write(chunk)
+                        continue
+                    head += chunk
+                    if buffered:
+                        continue
+                    try:
+                        size = sniff_image_size(head)
+                    except ValueError as ex:
+                        if sizes is not None:
+                            print("Invalid image:",ex)
+                            return False
+                        # any size is accepted, formats that can't be sniffed are saved as they are
+                        size = (0,0)
+                    if size is None:
+                        continue
+                    if not accept(size):
+                        return False
+                    buffered = target is not None or (normalizer is not None and normalizer.reencodes(head))
+                    if buffered:
+                        continue
+                    f = await writer.open(path)
+                    await f.write(head)
+            if f is None and not buffered:
+                try:
+                    size = quick_get_image_size(head)
+                except (IndexError, ValueError) as ex:
+                    if sizes is not None:
+                        print("Invalid image:",ex)
+                        return False
+                    size = (0,0)
+                if not accept(size):
+                    return False
+                buffered = target is not None or (normalizer is not None and normalizer.reencodes(head))
+                if not buffered:
+                    if stored:
+                        return await from_store()
+                    f = await writer.open(path)
+                    await f.write(head)
+            if buffered:
+                try:
+                    data, ext = await normalizer.normalize(head,target)
+                except (OSError, ValueError) as ex:
+                    print("Failed to normalize image:",ex)
+                    return False
+                if target:
+                    print("Resized image from {}x{} to {}x{}".format(*size,*target))
+                    METRICS.inc("images_resized_total")
+                METRICS.inc("images_normalized_total")
+                filename = asset_filename(appid,kind,ext)
+                path = os.path.join(gridpaths[0],filename)
+                other_paths = [os.path.join(p,filename) for p in gridpaths[1:]]
+                f = await writer.open(path)
+                await f.write(data)
+            def on_commit():
+                # the store holds the images as served, normalized ones depend on the settings
+                if writer.store and not buffered:
+                    writer.store.add(url,path)
+                for p in other_paths:
+                    clone_file(path,p)
+                remove_other_extensions()
+            def saved():
+                print("Saved to",filename)
+                if on_saved:
+                    on_saved()
+            await writer.commit(f,on_commit,saved)
+        except BaseException:
+            if f is not None:
+                await writer.discard(f)
+            raise
+    finally:
+        if resp is not None:
+            resp.close()
+    return True
+
 
+async def download_image(url,gridpath,appid,session,retrycount=3,writer=None,kind="portrait",controller=None,on_saved=None):
+    own_writer = writer is None
+    if own_writer:
+        writer = GridWriter(1)
 
-async def download_image(url,gridpath,appid,session,retrycount=3):
     try:
-        data, success = await retry_func_async(lambda:fetch_url(url,session,'bin'),
+        saved, success = await retry_func_async(lambda:stream_image(url,gridpath,appid,session,writer,kind=kind,on_saved=on_saved),
                         lambda ex: print("Download error: {}, retry".format(ex)),retrycount)
-        if not success:
-            return False
-        width, height = quick_get_image_size(data)
-        if width == 600 and height == 900:
-            filename = "{}p{}".format(appid,url[-4:])
-            with open(os.path.join(gridpath,filename),"wb") as f:
-                f.write(data)
-            print("Saved to",filename)
-            return True
-        else:
-            print("Image size incorrect:",width,height)
+        # a download counts once for the controller, however often it was retried
+        if controller and success and saved:
+            controller.on_success()
+        elif controller and not success:
+            controller.on_error()
+        return success and saved
     except:
         traceback.print_exc()
+    finally:
+        if own_writer:
+            await writer.close()
 
     return False
 
 
-async def download_cover(appid,path,session,args,excludeid=-1,retrycount=3):
+def rank_covers(covers,min_score=None):
+    # best scored first, covers below min_score are never downloaded
+    covers = sorted(covers,key=lambda x:x["score"],reverse=True)
+    if min_score is not None:
+        covers = [cover for cover in covers if cover["score"] >= min_score]
+    return covers
+
+async def download_candidates(appid,path,session,candidates,writer=None,kind="portrait",tried=None,controller=None,on_saved=None):
+    for value in candidates:
+        if tried is not None:
+            if value["id"] in tried:
+                continue
+            tried.add(value["id"])
+        print("Downloading {} {} by {}, url: {}".format(kind,value["id"],value["author"]["name"],value["url"]))
+        success = await download_image(value["url"],path,appid,session,writer=writer,kind=kind,controller=controller,on_saved=on_saved)
+        if success:
+            return True
+    return False
+
+async def download_cover(appid,path,session,args,excludeids=(),retrycount=3,cache=None,limiter=None,writer=None,kind="portrait",controller=None,on_saved=None):
     
     try:
-        rst = await query_cover_for_apps(appid,session,args.styles)
+        rst = await query_cover_for_apps(appid,session,args.styles,cache,limiter,kind)
     except :
         print("Failed to retrive cover data")
         return False
     if rst["success"]:
-        # sort by score
-        covers = rst["data"]
-        covers.sort(key=lambda x:x["score"],reverse=True)
+        covers = rank_covers(rst["data"],args.min_score)
         print("Found {} covers".format(len(covers)))
-        for value in covers:
-            if value["id"] == excludeid:
-                continue
-            print("Downloading cover {} by {}, url: {}".format(value["id"],value["author"]["name"],value["url"]))
-            success = await download_image(value["url"],path,appid,session)
-            if success:
-                return True
+        return await download_candidates(appid,path,session,covers,writer,kind,set(excludeids),controller,on_saved)
     return False
 
-async def download_covers(appids,gridpath,namedict,args):
+class CoverQueryFailed(Exception):
+    pass
+
+async def download_covers(targets,namedict,args,journal:DownloadJournal=None,normalizer:ImageNormalizer=None):
+    # targets maps every asset kind to the apps missing it and the grid paths of the
+    # accounts they are missing in. All kinds share the session, limiter and consumers.
+    # The normalizer is owned by the caller so its process pool outlives the run
     
-    batch_query_data = []
     query_size = 50
-    tasks = []
     proxies = urllib.request.getproxies()
-    result = {'total_downloaded':0}
+    result = {'total_downloaded':0,'total_found':0}
     if 'http' in proxies:
         os.environ['HTTP_PROXY'] = proxies['http']
         os.environ['HTTPS_PROXY'] = proxies['http']
-    async with aiohttp.ClientSession(trust_env=True) as session:
-        for index,sublist in enumerate(split_list(appids,query_size)):
-            sublist = [str(appid) for appid in sublist]
-            print('Querying covers {}-{}'.format(index*query_size+1,index*query_size+len(sublist)))
-            query_covers = lambda lst: lambda :query_cover_for_apps(lst,session,args.styles)
-            tasks.append(asyncio.create_task(retry_func_async(query_covers(sublist))))
-            
-        rsts = await asyncio.gather(*tasks)
-        for rst, success in rsts:
-            if success and rst['success']:
-                batch_query_data.extend(rst['data'])
-            else:
-                print("Failed to retrieve cover info")
-                sys.exit(4)
+    cache = None if args.no_cache else HttpCache(HTTP_CACHE_DIR,args.cache_ttl,args.cache_size*1024*1024)
+    limiter = RateLimiter(args.rate,budget=args.request_budget)
+    writer = GridWriter(store=None if args.no_cover_store else CoverStore(COVER_STORE_DIR,args.cover_store_size*1024*1024),normalizer=normalizer)
+    # the images come from a single host, more downloads than connections to it would only queue
+    connections_per_host = args.connections_per_host or args.max_downloads
+    controller = ConcurrencyController(args.downloads,max_workers=min(args.max_downloads,connections_per_host,args.connections))
+
+    def record(kind,appid,state,**fields):
+        if journal:
+            journal.record(appid,state,kind,**fields)
+
+    queue=asyncio.Queue()
+    query_targets = {kind:sorted(gridpaths) for kind,gridpaths in targets.items()}
+    if journal:
+        # resume from the journal: finished apps are skipped, chosen covers are not queried again
+        resumed = 0
+        for kind,gridpaths in targets.items():
+            query_appids = []
+            for appid in query_targets[kind]:
+                state = journal.state(appid,kind)
+                if journal.is_done(appid,gridpaths[appid],kind):
+                    resumed += 1
+                elif state and state['state'] == 'chosen':
+                    result['total_found'] += 1
+                    queue.put_nowait((kind,appid,[{'id':state['cover_id'],'url':state['url'],'author':{'name':state['author']}}]))
+                else:
+                    query_appids.append(appid)
+            query_targets[kind] = query_appids
+        print("Assets finished in previous run: {}, assets to download: {}, assets to query: {}".format(
+            resumed,queue.qsize(),sum(len(appids) for appids in query_targets.values())))
+    connector = aiohttp.TCPConnector(limit=args.connections,limit_per_host=connections_per_host,
+                                     ttl_dns_cache=args.dns_cache_ttl,keepalive_timeout=KEEPALIVE_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector,trust_env=True) as session:
+        active = [0]
+
         async def task(queue,downloadresult):
             while True:
-                appid,queryresult = await queue.get()
-                print("Found most voted cover for {} {} by {}".format(appid,namedict[appid],queryresult["author"]["name"]))
-                print("Downloading cover {}, url: {}".format(queryresult["id"],queryresult["url"]))
+                # consumers above the target of the controller stop before taking more work
+                if active[0] > controller.target:
+                    active[0] -= 1
+                    return
+                kind,appid,candidates = await queue.get()
+                gridpaths = targets[kind][appid]
+                print("Found most voted {} for {} {} by {}".format(kind,appid,namedict[appid],candidates[0]["author"]["name"]))
+
+                def saved(kind=kind,appid=appid):
+                    # only counted once the writer synced and renamed the file
+                    downloadresult['total_downloaded'] += 1
+                    METRICS.inc("covers_downloaded_total",kind=kind)
+                    record(kind,appid,'downloaded')
                 try:
-                    success = await download_image(queryresult['url'],gridpath,appid,session)       
+                    # the candidates of the batch query are tried in order of score,
+                    # the app is only queried again once all of them failed
+                    tried = set()
+                    success = await download_candidates(appid,gridpaths,session,candidates,writer,kind,tried,controller,saved)
                     if not success:     
-                        print("Finding all covers for {} {}".format(appid,namedict[int(appid)]))
-                        success = await download_cover(appid,gridpath,queryresult['id'],args)
-                    if success:
-                        downloadresult['total_downloaded'] += 1
+                        print("Finding all {} assets for {} {}".format(kind,appid,namedict[int(appid)]))
+                        METRICS.inc("fallback_queries_total",kind=kind)
+                        success = await download_cover(appid,gridpaths,session,args,tried,cache=cache,limiter=limiter,writer=writer,kind=kind,controller=controller,on_saved=saved)
+                    if not success:
+                        METRICS.inc("covers_failed_total",kind=kind)
+                        record(kind,appid,'failed',reason='download')
                 except Exception as ex:
                     print(ex)
                 queue.task_done()
-        tasks = []
-        queue=asyncio.Queue()
-
-        number_jobs = 0
-
-        for appid,queryresult in batch_query_data:
-            appid = int(appid)
-            if not queryresult['success']:
-                print("Error finding cover for {}, {}".format(appid,' '.join(queryresult['errors'])))
-            elif len(queryresult['data']) == 0:
-                print("No cover found for {} {}".format(appid,namedict[appid]))
-            elif args.min_score!= None and queryresult['data'][0]['score'] < args.min_score:
-                print("Most voted cover for {} {} has score of {} < {} , skipping.".format(appid,namedict[appid],queryresult['data'][0]['score'],args.min_score))
-            else:
-                number_jobs += 1
-                queue.put_nowait((appid,queryresult['data'][0]))
 
-        if number_jobs:
-            print("Found {} covers, downloading...".format(number_jobs))
+        # each batch feeds the download consumers as soon as its query returns
+        async def query_batch(kind,index,sublist,queue):
+            print('Querying {} {}-{}'.format(kind,index*query_size+1,index*query_size+len(sublist)))
+            rst, success = await retry_func_async(lambda:query_cover_for_apps(sublist,session,args.styles,cache,limiter,kind),
+                                                  lambda ex: print("Error querying {}: {}, retry".format(kind,ex)),backoff=1)
+            if not success or not rst['success']:
+                return False
+            for appid,queryresult in rst['data']:
+                appid = int(appid)
+                if not queryresult['success']:
+                    print("Error finding {} for {}, {}".format(kind,appid,' '.join(queryresult['errors'])))
+                    record(kind,appid,'failed',reason='error')
+                elif len(queryresult['data']) == 0:
+                    print("No {} found for {} {}".format(kind,appid,namedict[appid]))
+                    record(kind,appid,'failed',reason='no_cover')
+                else:
+                    candidates = rank_covers(queryresult['data'],args.min_score)
+                    if not candidates:
+                        top_score = max(cover['score'] for cover in queryresult['data'])
+                        print("Most voted {} for {} {} has score of {} < {} , skipping.".format(kind,appid,namedict[appid],top_score,args.min_score))
+                        record(kind,appid,'failed',reason='low_score')
+                        continue
+                    result['total_found'] += 1
+                    cover = candidates[0]
+                    record(kind,appid,'chosen',cover_id=cover['id'],url=cover['url'],author=cover['author']['name'])
+                    queue.put_nowait((kind,appid,candidates))
+            return True
 
-        consumers = [asyncio.create_task(task(queue,result)) for i in range(20)]
-        
-        await queue.join()
-        for c in consumers:
-            c.cancel()
+        consumers = []
+
+        def add_consumers():
+            while active[0] < controller.target:
+                active[0] += 1
+                consumers.append(asyncio.create_task(task(queue,result)))
+
+        async def control():
+            while True:
+                await asyncio.sleep(controller.interval)
+                target = controller.target
+                if controller.adjust(queue.qsize()) != target:
+                    print("Concurrent downloads: {} -> {}".format(target,controller.target))
+                    METRICS.inc("concurrency_adjustments_total")
+                add_consumers()
+
+        add_consumers()
+        consumers.append(asyncio.create_task(control()))
+        try:
+            with METRICS.phase("sgdb_query"):
+                rsts = await asyncio.gather(*[query_batch(kind,index,[str(appid) for appid in sublist],queue)
+                                              for kind,appids in query_targets.items()
+                                              for index,sublist in enumerate(split_list(appids,query_size))],
+                                            return_exceptions=True)
+            failed_batches = 0
+            for rst in rsts:
+                if isinstance(rst,BaseException) and not isinstance(rst,BudgetExceeded):
+                    raise rst
+                if rst is not True:
+                    failed_batches += 1
+            if failed_batches and rsts:
+                if limiter.budget is not None and limiter.used >= limiter.budget:
+                    print("Request budget of {} exhausted".format(limiter.budget))
+                print("Failed to retrieve cover info for {} of {} batches".format(failed_batches,len(rsts)))
+                if failed_batches == len(rsts):
+                    raise CoverQueryFailed("No cover query to steamgriddb succeeded")
+            print("Found {} assets, waiting for downloads to finish".format(result['total_found']))
+            await queue.join()
+        finally:
+            for c in consumers:
+                c.cancel()
+            await writer.close()
     return result['total_downloaded']
 
 
@@ -484,6 +1052,111 @@ async def download_covers_temp(appids,gridpath,namedict):
         
     return result['total_downloaded']
 
+def scan_grid(grid_index):
+    with METRICS.phase("grid_scan"):
+        changed = grid_index.scan()
+        grid_index.save()
+    METRICS.inc("grid_files_changed_total",changed)
+    return grid_index
+
+def find_local_cover_appids(grid_index,kind="portrait"):
+    return set(scan_grid(grid_index).find(kind).keys())
+
+def find_local_missing_covers(grid_index,missing_cover_app_dict,args,kind="portrait"):
+    local_cover_map = scan_grid(grid_index).find(kind)
+    local_cover_appids = set(local_cover_map.keys())
+    print("Total local {} assets found:".format(kind),len(local_cover_appids))
+    local_missing_cover_appids = missing_cover_app_dict.keys() - local_cover_appids
+    print("Total missing {} assets locally:".format(kind),len(local_missing_cover_appids))
+    if args.overwrite:
+        local_missing_cover_appids = set(missing_cover_app_dict.keys())
+
+    if args.delete_local:
+        local_duplicate_cover_appids = local_cover_appids - missing_cover_app_dict.keys()
+        print(f'Found {len(local_duplicate_cover_appids)} games already have official {kind} assets.')
+        for appid in local_duplicate_cover_appids:
+            for filename in local_cover_map[appid]:
+                print(f'Deleting file {os.path.join(grid_index.gridpath,filename)}')
+                grid_index.remove(filename)
+        grid_index.save()
+    return local_missing_cover_appids
+
+def watch_library(steam_data_reader,steam_path,grid_indexes,args,normalizer=None):
+    # only packages added since the last snapshot are resolved. Packages missing from the
+    # appcache are tried again on the next change. The grid folders are not watched,
+    # assets are only downloaded for new packages and covers the user deleted stay deleted
+    owned = {steamid:set() for steamid in grid_indexes}
+    missing = {steamid:{kind:{} for kind in args.assets} for steamid in grid_indexes}
+    # assets of a failed round, queried again with the next change
+    pending = {}
+
+    def add_packages(steamid,packageids):
+        packages = steam_data_reader.get_package_details(packageids)
+        appids = steam_data_reader.get_appids_from_packages(packages)
+        apps = steam_data_reader.get_app_details(appids)
+        owned[steamid] |= {packageid for packageid,package in packages.items()
+                           if all(appid in apps for appid in package['appids'].values())}
+        new_missing = {}
+        for kind in args.assets:
+            new_missing[kind] = steam_data_reader.get_missing_cover_dict_from_app_details(apps,kind)
+            missing[steamid][kind].update(new_missing[kind])
+        return new_missing
+
+    for steamid in grid_indexes:
+        add_packages(steamid,steam_data_reader.get_owned_packages(steamid))
+    steam_data_reader.close()
+
+    appcache_paths = [STEAM_APPINFO.format(steam_path),STEAM_PACKAGEINFO.format(steam_path)]
+    # the owned packages are read from the licensecache
+    license_paths = [f"{steam_path}/userdata/{steamid.as_32}/config/licensecache" for steamid in grid_indexes]
+    watcher = FileWatcher(appcache_paths + license_paths,args.watch_interval)
+    print("Watching for new licenses, press Ctrl+C to stop")
+    try:
+        while True:
+            watcher.wait()
+            try:
+                targets = {kind:{} for kind in args.assets}
+                try:
+                    for steamid,grid_index in grid_indexes.items():
+                        new_packageids = set(steam_data_reader.get_owned_packages(steamid)) - owned[steamid]
+                        new_missing = {}
+                        if new_packageids:
+                            print("New packages for {}: {}".format(steamid.as_32,len(new_packageids)))
+                            new_missing = add_packages(steamid,new_packageids)
+                        for kind in args.assets:
+                            appids = set(new_missing.get(kind,{}))
+                            appids |= {appid for appid,gridpaths in pending.get(kind,{}).items() if grid_index.gridpath in gridpaths}
+                            if not appids:
+                                continue
+                            for appid in appids - find_local_cover_appids(grid_index,kind):
+                                targets[kind].setdefault(appid,[]).append(grid_index.gridpath)
+                finally:
+                    # the appcache is not mapped while downloading and waiting
+                    steam_data_reader.close()
+                targets = {kind:gridpaths for kind,gridpaths in targets.items() if gridpaths}
+                if not targets:
+                    continue
+                namedict = {appid:name for account_missing in missing.values()
+                            for kind_missing in account_missing.values() for appid,name in kind_missing.items()}
+                print("Finding assets for {} games".format(len(set().union(*targets.values()))))
+                pending = targets
+                with METRICS.phase("download"):
+                    total_downloaded = asyncio.run(download_covers(targets,namedict,args,normalizer=normalizer))
+                pending = {}
+                print("Total assets downloaded:",total_downloaded)
+            # a failed round must not end the watch, the next change tries again
+            except (CoverQueryFailed,aiohttp.ClientError,OSError) as ex:
+                print("Error processing changes:",ex)
+    finally:
+        watcher.close()
+
+def jpeg_quality(value):
+    # higher qualities of pillow disable parts of the jpeg compression
+    quality = int(value)
+    if not 1 <= quality <= 95:
+        raise argparse.ArgumentTypeError("jpeg quality must be between 1 and 95, got {}".format(quality))
+    return quality
+
 def main():
     try:
         steam_path = SteamDataReader.get_steam_installpath()
@@ -505,8 +1178,65 @@ def main():
                         help='Overwrite covers that are already present in local steam grid path.')
     parser.add_argument('-d','--delete-local', action='store_true', dest='delete_local',
                         help='Delete local covers for games that already have official ones.')
+    parser.add_argument('--assets',  dest='assets', type=str, default='portrait',
+                        help='Asset kinds to download, can be comma separated list of portrait, landscape, hero or logo.')
+    parser.add_argument('-a','--all-accounts', action='store_true', dest='all_accounts',
+                        help='Download covers for all accounts that logged in on this computer, only works in local mode.')
+    parser.add_argument('--watch', action='store_true', dest='watch',
+                        help='Keep running and download covers for newly added games, only works in local mode.')
+    parser.add_argument('--watch-interval',  dest='watch_interval', type=float, default=5,
+                        help='Seconds between checks for changes on systems without inotify.')
+    parser.add_argument('--remote-concurrency',  dest='remote_concurrency', type=int, default=4,
+                        help='Number of product info requests in flight at once in remote mode.')
+    parser.add_argument('--cache-ttl',  dest='cache_ttl', type=int, default=86400,
+                        help='Seconds a cached steamgriddb response is used before it is revalidated.')
+    parser.add_argument('--cache-size',  dest='cache_size', type=int, default=100,
+                        help='Maximum size of the steamgriddb response cache in MB.')
+    parser.add_argument('--no-cache', action='store_true', dest='no_cache',
+                        help='Do not cache steamgriddb responses.')
+    parser.add_argument('--rate',  dest='rate', type=float, default=4.0,
+                        help='Maximum steamgriddb API requests per second, lowered automatically when throttled.')
+    parser.add_argument('--request-budget',  dest='request_budget', type=int, default=None,
+                        help='Maximum number of steamgriddb API requests in one run.')
+    parser.add_argument('--normalize', action='store_true', dest='normalize',
+                        help='Scale down larger images with the right aspect ratio instead of skipping them, needs Pillow.')
+    parser.add_argument('--jpeg-quality',  dest='jpeg_quality', type=jpeg_quality, default=None,
+                        help='Re-encode png images without transparency as jpeg of this quality (1-95), needs Pillow.')
+    parser.add_argument('--normalize-workers',  dest='normalize_workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of processes used to normalize images.')
+    parser.add_argument('--downloads',  dest='downloads', type=int, default=20,
+                        help='Number of concurrent image downloads to start with, adjusted to the measured throughput.')
+    parser.add_argument('--max-downloads',  dest='max_downloads', type=int, default=64,
+                        help='Maximum number of concurrent image downloads.')
+    parser.add_argument('--connections',  dest='connections', type=int, default=100,
+                        help='Maximum number of open connections.')
+    parser.add_argument('--connections-per-host',  dest='connections_per_host', type=int, default=None,
+                        help='Maximum number of open connections to one host, the maximum number of downloads by default.')
+    parser.add_argument('--dns-cache-ttl',  dest='dns_cache_ttl', type=int, default=300,
+                        help='Seconds resolved host names are cached.')
+    parser.add_argument('--no-cover-store', action='store_true', dest='no_cover_store',
+                        help='Do not share downloaded covers between accounts and runs through the local cover store.')
+    parser.add_argument('--cover-store-size',  dest='cover_store_size', type=int, default=500,
+                        help='Maximum size of the local cover store in MB.')
+    parser.add_argument('--metrics-json',  dest='metrics_json', type=str, default=None,
+                        help='Write timings and counters of the run to this json file.')
+    parser.add_argument('--metrics-prom',  dest='metrics_prom', type=str, default=None,
+                        help='Write timings and counters of the run to this Prometheus textfile.')
+    parser.add_argument('--resume', action='store_true', dest='resume',
+                        help='Resume the previous run from its journal, skipping work that was already done.')
+    parser.add_argument('-w','--workers',  dest='workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of processes used to decode appinfo.vdf when many apps need to be decoded.')
 
     args = parser.parse_args()
+    args.assets = [kind.strip() for kind in args.assets.split(',') if kind.strip()]
+    for kind in args.assets:
+        if kind not in ASSET_TYPES:
+            parser.error("unknown asset kind {}, choose from {}".format(kind,', '.join(ASSET_TYPES)))
+    # written at exit, so runs that stop early are reported too
+    if args.metrics_json:
+        atexit.register(METRICS.write_json,args.metrics_json)
+    if args.metrics_prom:
+        atexit.register(METRICS.write_prometheus,args.metrics_prom)
     local_mode = True
     remote_fallback = True
     if not args.local_mode and args.remote_mode:
@@ -514,8 +1244,16 @@ def main():
     elif args.local_mode and not args.remote_mode:
         remote_fallback = False
 
-    if local_mode:
-        steam_data_reader = SteamDataReaderLocal(steam_path)
+    if (args.all_accounts or args.watch) and not local_mode:
+        print("All accounts and watch mode only work in local mode")
+        sys.exit(2)
+    if args.all_accounts:
+        steam_data_reader = SteamDataReaderLocal(steam_path,args.workers)
+        if not steam_data_reader.get_steam_ids():
+            print("No accounts with license cache found")
+            sys.exit(2)
+    elif local_mode:
+        steam_data_reader = SteamDataReaderLocal(steam_path,args.workers)
         try:
             steamid = steam_data_reader.get_steam_id()
             if not steamid.is_valid():
@@ -543,41 +1281,79 @@ def main():
         else:
             print("Login Success")
 
-        steam_data_reader = SteamDataReaderRemote(client)
+        steam_data_reader = SteamDataReaderRemote(client,concurrency=args.remote_concurrency)
 
         steamid = client.steam_id
         print("SteamID:",steamid.as_32)
         
-    steam_grid_path = STEAM_GRIDPATH.format(steam_path,steamid.as_32)
-    if not os.path.isdir(steam_grid_path):
-        os.mkdir(steam_grid_path)
-    print("Steam grid path:",steam_grid_path)
-    missing_cover_app_dict =  steam_data_reader.get_missing_cover_app_dict(not local_mode)
-    
-    print("Total games missing cover in library:",len(missing_cover_app_dict))
-    local_cover_map = {int(file[:len(file)-5]):file for file in os.listdir(steam_grid_path) if re.match(r"^\d+p.(png|jpg)$",file)}
-    local_cover_appids = set(local_cover_map.keys())
-    print("Total local covers found:",len(local_cover_appids))
-    local_missing_cover_appids = missing_cover_app_dict.keys() - local_cover_appids
-    print("Total missing covers locally:",len(local_missing_cover_appids))
-    if args.overwrite:
-        local_missing_cover_appids = set(missing_cover_app_dict.keys())
-
-    if args.delete_local:
-        local_duplicate_cover_appids = local_cover_appids - missing_cover_app_dict.keys()
-        print(f'Found {len(local_duplicate_cover_appids)} games already have official covers.')
-        for appid in local_duplicate_cover_appids:
-            path = os.path.join(steam_grid_path,local_cover_map[appid])
-            print(f'Deleting file {path}')
-            os.remove(path)
+    if args.all_accounts:
+        steamids = steam_data_reader.get_steam_ids()
+        journal = DownloadJournal(JOURNAL.format("all"))
+    else:
+        steamids = [steamid]
+        journal = DownloadJournal(JOURNAL.format(steamid.as_32))
+    grid_indexes = {}
+    for steamid in steamids:
+        steam_grid_path = STEAM_GRIDPATH.format(steam_path,steamid.as_32)
+        if not os.path.isdir(steam_grid_path):
+            os.mkdir(steam_grid_path)
+        else:
+            # temp files of downloads an earlier run was interrupted in
+            GridWriter.remove_stale(steam_grid_path)
+        print("Steam grid path:",steam_grid_path)
+        grid_indexes[steamid] = GridIndex(steam_grid_path,GRID_INDEX.format(steamid.as_32))
+        grid_indexes[steamid].load()
+    if args.resume and journal.load():
+        missing_cover_app_dict = journal.apps
+        # journals of older runs have no grid paths, they were written for a single account
+        targets = journal.targets or {"portrait":{appid:[steam_grid_path] for appid in journal.apps}}
+        print("Resuming previous run with {} games missing covers".format(len(journal.apps)))
+    else:
+        # the appcache is parsed once and shared by all accounts, every asset
+        # is queried once and saved to the grids of all accounts missing it
+        missing_cover_app_dict = {}
+        targets = {kind:{} for kind in args.assets}
+        for steamid,grid_index in grid_indexes.items():
+            if args.all_accounts:
+                print("Processing account",steamid.as_32)
+            account_missing_assets = steam_data_reader.get_missing_cover_app_dict(not local_mode,steamid,args.assets)
+            for kind in args.assets:
+                missing_cover_app_dict.update(account_missing_assets[kind])
+                print("Total games missing {} assets in library:".format(kind),len(account_missing_assets[kind]))
+                for appid in find_local_missing_covers(grid_index,account_missing_assets[kind],args,kind):
+                    targets[kind].setdefault(appid,[]).append(grid_index.gridpath)
+        steam_data_reader.close()
 
+        print("Finding covers from steamgriddb.com")
+        local_missing_cover_appids = sorted(set().union(*targets.values()))
+        if args.all_accounts:
+            print("Total games missing assets in {} accounts: {}".format(len(steamids),len(local_missing_cover_appids)))
+        journal.start({appid:missing_cover_app_dict[appid] for appid in local_missing_cover_appids},targets)
     
-    print("Finding covers from steamgriddb.com")
-    local_missing_cover_appids = list(local_missing_cover_appids)
-    local_missing_cover_appids.sort()
-    
-    total_downloaded = asyncio.run(download_covers(local_missing_cover_appids,steam_grid_path,missing_cover_app_dict,args))
-    print("Total cover downloaded:",total_downloaded)
+    normalizer = None
+    if args.normalize or args.jpeg_quality is not None:
+        if ImageNormalizer.available():
+            normalizer = ImageNormalizer(args.normalize_workers,args.normalize,args.jpeg_quality)
+        else:
+            print("Pillow is not installed, images are not normalized")
+    try:
+        try:
+            with METRICS.phase("download"):
+                total_downloaded = asyncio.run(download_covers(targets,missing_cover_app_dict,args,journal,normalizer))
+        except CoverQueryFailed as ex:
+            print(ex)
+            sys.exit(4)
+        finally:
+            journal.close()
+        print("Total assets downloaded:",total_downloaded)
+        if args.watch:
+            if not local_mode:
+                print("Watch mode only works in local mode")
+                sys.exit(2)
+            watch_library(steam_data_reader,steam_path,grid_indexes,args,normalizer)
+    finally:
+        if normalizer:
+            normalizer.close()
     
 
 if __name__ == "__main__":
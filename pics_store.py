@@ -0,0 +1,65 @@
+import json
+import os
+import os.path
+
+# 2 added the header image to the stored apps
+STORE_VERSION = 2
+
+def project(data, paths):
+    """
+    Returns a copy of the nested dict ``data`` that only has the key ``paths``.
+    """
+    rst = {}
+    for path in paths:
+        src, dst = data, rst
+        for key in path[:-1]:
+            src = src.get(key)
+            if not isinstance(src, dict):
+                break
+            dst = dst.setdefault(key, {})
+        else:
+            if path[-1] in src:
+                dst[path[-1]] = src[path[-1]]
+    return rst
+
+class PicsStore:
+    """
+    Product info fetched in remote mode, stored with the PICS change number it
+    is current as of. Entries that changed since then are dropped by the
+    remote reader before it requests anything.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.change_number = 0
+        self.apps = {}
+        self.packages = {}
+
+    def clear(self):
+        self.change_number = 0
+        self.apps = {}
+        self.packages = {}
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path,encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print("Ignoring unreadable product info store",self.path)
+            return
+        if data.get("version") != STORE_VERSION:
+            return
+        self.change_number = data["change_number"]
+        self.apps = {int(appid):app for appid,app in data["apps"].items()}
+        self.packages = {int(pkgid):pkg for pkgid,pkg in data["packages"].items()}
+
+    def save(self):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname,exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path,"w",encoding="utf-8") as f:
+            json.dump({"version":STORE_VERSION,"change_number":self.change_number,
+                       "apps":self.apps,"packages":self.packages},f,separators=(',',':'))
+        os.replace(tmp_path,self.path)
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def parse_retry_after(value):
+    """
+    Returns the delay in seconds of a ``Retry-After`` header, which is either
+    a number of seconds or a http date. Returns ``None`` if it can't be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all steamgriddb API calls.
+
+    The rate starts at ``max_rate`` requests per second. It is halved when the
+    server throttles or fails, and grows back by ``increase`` per successful
+    request. A ``Retry-After`` delay pauses every caller. If ``budget`` is set,
+    ``acquire`` raises ``BudgetExceeded`` once that many requests were made.
+    """
+    def __init__(self, max_rate=4.0, burst=8, budget=None, min_rate=0.2, increase=0.1):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.burst = burst
+        self.budget = budget
+        self.increase = increase
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.used = 0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            if self.budget is not None and self.used >= self.budget:
+                raise BudgetExceeded("Request budget of {} exhausted".format(self.budget))
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.used += 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttled(self, retry_after=None):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0
+        delay = retry_after if retry_after is not None else 1 / self.rate
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    def on_error(self):
+        self.rate = max(self.min_rate, self.rate / 2)
@@ -0,0 +1,21 @@
+import os
+import os.path
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmark"))
+
+import synthetic
+
+
+@pytest.fixture(scope="session")
+def appinfo_data():
+    return synthetic.appinfo_dumps(300, seed=1)
+
+
+@pytest.fixture(scope="session")
+def packageinfo_data(appinfo_data):
+    return synthetic.packageinfo_dumps(60, synthetic.appids_of(appinfo_data), seed=1)
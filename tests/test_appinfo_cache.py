@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import missing_cover_downloader
+import vdf
+from appinfo_cache import AppinfoCache, CACHE_VERSION, PROJECTION_PATHS
+from missing_cover_downloader import ASSET_TYPES, SteamDataReader, SteamDataReaderLocal
+
+
+def test_changed_change_number_invalidates(tmp_path):
+    cache = AppinfoCache(str(tmp_path / "cache.json"))
+    cache.update(10, 5, {"common": {"type": "Game", "name": "A"}})
+    assert cache.get(10, 5) == [5, "Game", "A", []]
+    assert cache.get(10, 6) is None
+    assert cache.get(20, 5) is None
+
+
+@pytest.mark.parametrize("kind", sorted(ASSET_TYPES))
+def test_details_keep_the_official_assets(kind):
+    official = ASSET_TYPES[kind]["official"]
+    with_asset = {"type": "Game", "name": "A"}
+    if len(official) == 2:
+        with_asset[official[0]] = {official[1]: {"english": "x.jpg"}}
+    else:
+        with_asset[official[0]] = "x.jpg"
+    for common in ({"type": "Game", "name": "A"}, {"type": "Game", "name": "A", "library_assets": {}}, with_asset):
+        details = AppinfoCache.to_app_details(AppinfoCache(None).update(10, 1, {"common": common}))
+        assert details["common"]["name"] == "A"
+        assert SteamDataReader.has_official_asset(details["common"], kind) == SteamDataReader.has_official_asset(common, kind)
+
+
+def test_details_of_the_appcache(appinfo_data):
+    # every kind finds the same games missing assets from the cached entries as from the projection
+    lazy = vdf.appinfo_lazy_loads(appinfo_data)
+    cache = AppinfoCache(None)
+    projected = {appid: lazy.project(appid, PROJECTION_PATHS) for appid in lazy}
+    cached = {appid: AppinfoCache.to_app_details(cache.update(appid, lazy.change_number(appid), app))
+              for appid, app in projected.items()}
+    reader = SteamDataReader()
+    for kind in ASSET_TYPES:
+        assert reader.get_missing_cover_dict_from_app_details(cached, kind) == \
+            reader.get_missing_cover_dict_from_app_details(projected, kind)
+    assert AppinfoCache.to_app_details(cache.update(1, 1, {})) == {}
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "cache" / "cache.json"
+    cache = AppinfoCache(str(path))
+    cache.update(10, 5, {"common": {"type": "Game", "name": "A", "header_image": {}}})
+    cache.save()
+    loaded = AppinfoCache(str(path))
+    loaded.load()
+    assert loaded.apps == {10: [5, "Game", "A", ["header_image"]]}
+
+
+def test_other_versions_and_unreadable_files_are_ignored(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"version": CACHE_VERSION - 1, "apps": {"10": [5, "Game", "A", []]}}), encoding="utf-8")
+    cache = AppinfoCache(str(path))
+    cache.load()
+    assert cache.apps == {}
+    path.write_text("{not json", encoding="utf-8")
+    cache.load()
+    assert cache.apps == {}
+
+
+def test_reader_decodes_only_changed_apps(tmp_path, monkeypatch, appinfo_data):
+    cache_path = tmp_path / "appinfo_cache.json"
+    monkeypatch.setattr(missing_cover_downloader, "APPINFO_CACHE", str(cache_path))
+    (tmp_path / "appcache").mkdir()
+    (tmp_path / "appcache" / "appinfo.vdf").write_bytes(appinfo_data)
+    lazy = vdf.appinfo_lazy_loads(appinfo_data)
+    appids = [appid for appid in lazy if "common" in lazy.project(appid, PROJECTION_PATHS)][:2]
+    current, changed = appids
+    # entries with the current change number are used as they are, the others are decoded again
+    cache = AppinfoCache(str(cache_path))
+    cache.apps = {current: [lazy.change_number(current), "Game", "Cached", []],
+                  changed: [lazy.change_number(changed) - 1, "Game", "Stale", []]}
+    cache.dirty = True
+    cache.save()
+    reader = SteamDataReaderLocal(str(tmp_path))
+    try:
+        apps = reader.get_app_details(appids)
+    finally:
+        reader.close()
+    assert apps[current]["common"]["name"] == "Cached"
+    assert apps[changed]["common"]["name"] == lazy.project(changed, PROJECTION_PATHS)["common"]["name"]
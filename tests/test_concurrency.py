@@ -0,0 +1,84 @@
+import asyncio
+
+import concurrency
+import missing_cover_downloader
+from concurrency import ConcurrencyController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def controller(monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(concurrency.time, "monotonic", clock)
+    return ConcurrencyController(**kwargs), clock
+
+
+def interval(ctrl, clock, successes, errors=0, backlog=100):
+    for _ in range(successes):
+        ctrl.on_success()
+    for _ in range(errors):
+        ctrl.on_error()
+    clock.now += ctrl.interval
+    return ctrl.adjust(backlog)
+
+
+def test_initial_target_is_clamped():
+    assert ConcurrencyController(initial=100, max_workers=64).target == 64
+    assert ConcurrencyController(initial=0, min_workers=2).target == 2
+    assert ConcurrencyController(initial=5, min_workers=8, max_workers=4).target == 4
+
+
+def test_climbs_while_throughput_improves(monkeypatch):
+    ctrl, clock = controller(monkeypatch, initial=8, max_workers=64)
+    assert interval(ctrl, clock, 10) == 10
+    assert interval(ctrl, clock, 20) == 12
+    assert interval(ctrl, clock, 30) == 15
+    # throughput dropped, turn around
+    assert interval(ctrl, clock, 20) == 12
+
+
+def test_backs_off_on_errors(monkeypatch):
+    ctrl, clock = controller(monkeypatch, initial=32)
+    assert interval(ctrl, clock, 5, errors=5) == 16
+    assert ctrl.direction == 1
+    assert ctrl.last_throughput is None
+
+
+def test_stays_within_bounds(monkeypatch):
+    ctrl, clock = controller(monkeypatch, initial=60, max_workers=64)
+    for i in range(10):
+        interval(ctrl, clock, 100 * (i + 1))
+    assert ctrl.target == 64
+    for _ in range(10):
+        interval(ctrl, clock, 1, errors=10)
+    assert ctrl.target == ctrl.min_workers
+
+
+def test_no_change_without_backlog_or_completions(monkeypatch):
+    ctrl, clock = controller(monkeypatch, initial=20)
+    assert interval(ctrl, clock, 10, backlog=0) == 20
+    assert ctrl.successes == 0
+    assert interval(ctrl, clock, 0) == 20
+
+
+def test_failed_download_counts_once(monkeypatch):
+    async def failing_stream(*args, **kwargs):
+        raise OSError("connection reset")
+
+    async def rejected_stream(*args, **kwargs):
+        return False
+
+    ctrl = ConcurrencyController()
+    monkeypatch.setattr(missing_cover_downloader, "stream_image", failing_stream)
+    assert not asyncio.run(missing_cover_downloader.download_image("u", "grid", 10, None, retrycount=3, controller=ctrl))
+    assert (ctrl.successes, ctrl.errors) == (0, 1)
+    # a rejected image is neither
+    monkeypatch.setattr(missing_cover_downloader, "stream_image", rejected_stream)
+    assert not asyncio.run(missing_cover_downloader.download_image("u", "grid", 10, None, controller=ctrl))
+    assert (ctrl.successes, ctrl.errors) == (0, 1)
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import re
+
+import aiohttp
+import pytest
+
+from http_cache import HttpCache
+from missing_cover_downloader import query_cover_for_apps
+
+KNOWN = {"1": [{"id": 11, "score": 3}], "2": [{"id": 21, "score": 1}]}
+
+
+class Response:
+    def __init__(self, status, body):
+        self.status = status
+        self.headers = {}
+        self.body = json.dumps(body).encode("utf-8")
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=self.status, message="Not Found")
+
+    async def read(self):
+        return self.body
+
+    async def json(self):
+        return json.loads(self.body)
+
+
+class Session:
+    # answers like the steamgriddb api: per app results for a batch, 404 for a single unknown app
+    def __init__(self):
+        self.urls = []
+
+    async def get(self, url, **kwargs):
+        self.urls.append(url)
+        appids = re.search(r"/steam/([\d,]+)\?", url).group(1).split(",")
+        if len(appids) > 1:
+            return Response(200, {"success": True, "data": [
+                {"success": True, "data": KNOWN[appid]} if appid in KNOWN
+                else {"success": False, "errors": ["Game not found"]} for appid in appids]})
+        if appids[0] in KNOWN:
+            return Response(200, {"success": True, "data": KNOWN[appids[0]]})
+        return Response(404, {"success": False, "errors": ["Game not found"]})
+
+
+def test_unknown_app_left_alone_in_a_batch(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    session = Session()
+    first = asyncio.run(query_cover_for_apps(["1", "2", "999"], session, cache=cache))
+    assert [(appid, rst["success"]) for appid, rst in first["data"]] == [("1", True), ("2", True), ("999", False)]
+    # the failed answer is not cached, the unknown app is queried alone and gets its 404
+    second = asyncio.run(query_cover_for_apps(["1", "2", "999"], session, cache=cache))
+    assert len(session.urls) == 2
+    assert "/steam/999?" in session.urls[1]
+    assert second["success"]
+    assert dict(second["data"])["1"] == {"success": True, "data": KNOWN["1"]}
+    assert dict(second["data"])["999"]["success"] is False
+
+
+def test_other_errors_of_a_single_app_are_raised():
+    class FailingSession(Session):
+        async def get(self, url, **kwargs):
+            return Response(500, {})
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(query_cover_for_apps(["999"], FailingSession()))
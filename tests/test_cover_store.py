@@ -0,0 +1,42 @@
+import os
+import time
+
+from cover_store import CoverStore, clone_file
+
+
+def test_clone_is_an_independent_copy(tmp_path):
+    src = tmp_path / "src.png"
+    src.write_bytes(b"cover")
+    dst = tmp_path / "dst.png"
+    dst.write_bytes(b"old")
+    clone_file(str(src), str(dst))
+    assert dst.read_bytes() == b"cover"
+    assert os.stat(dst).st_ino != os.stat(src).st_ino
+    assert not (tmp_path / "dst.png.part").exists()
+
+
+def test_add_get_and_materialize(tmp_path):
+    store = CoverStore(str(tmp_path / "store"))
+    url = "https://cdn2.steamgriddb.com/grid/abc.png"
+    assert store.get(url) is None
+    src = tmp_path / "10p.png"
+    src.write_bytes(b"cover")
+    store.add(url, str(src))
+    assert store.get(url).endswith(".png")
+    store.materialize(url, str(tmp_path / "20p.png"))
+    assert (tmp_path / "20p.png").read_bytes() == b"cover"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    store = CoverStore(str(tmp_path / "store"), max_size=3500)
+    src = tmp_path / "cover.png"
+    src.write_bytes(b"x" * 1000)
+    for i in range(3):
+        store.add("u{}.png".format(i), str(src))
+        past = time.time() - 100 + i
+        os.utime(store.object_path("u{}.png".format(i)), (past, past))
+    assert store.get("u0.png")
+    store.add("u3.png", str(src))
+    assert store.get("u1.png") is None
+    assert all(store.get(url) for url in ("u0.png", "u2.png", "u3.png"))
+    assert store.size == 3000
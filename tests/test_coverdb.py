@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+import coverdb
+
+APPS = {"10": "Half-Life", "20": "Team Fortress Classic", "7": "Ünïcode", "500": ""}
+
+
+@pytest.fixture
+def db_files(tmp_path):
+    json_path = tmp_path / "missingcoverdb.json"
+    json_path.write_text(json.dumps(APPS), encoding="utf-8")
+    return str(tmp_path / "missingcoverdb.bin"), str(json_path)
+
+
+def test_lookup(db_files):
+    db_path, json_path = db_files
+    assert coverdb.convert(json_path, db_path) == len(APPS)
+    db = coverdb.CoverDB(db_path)
+    try:
+        assert len(db) == len(APPS)
+        for appid, name in APPS.items():
+            assert db.get(int(appid)) == name
+        assert db.get(11) is None
+        assert db.get(0, "missing") == "missing"
+        assert db.intersect([7, 8, 500, 10**6]) == {7: "Ünïcode", 500: ""}
+    finally:
+        db.close()
+
+
+def test_load_rebuilds_stale_database(db_files):
+    db_path, json_path = db_files
+    coverdb.convert(json_path, db_path)
+    os.utime(db_path, (0, 0))
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"30": "Day of Defeat"}, f)
+    db = coverdb.load(db_path, json_path)
+    try:
+        assert db.intersect([10, 30]) == {30: "Day of Defeat"}
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("length", [0, 5, -1])
+def test_truncated_database(db_files, length):
+    db_path, json_path = db_files
+    coverdb.convert(json_path, db_path)
+    with open(db_path, "rb") as f:
+        data = f.read()
+    with open(db_path, "wb") as f:
+        f.write(data[:length])
+    with pytest.raises(ValueError):
+        coverdb.CoverDB(db_path)
+    # newer than the json, so only the check of the file itself triggers the rebuild
+    os.utime(db_path)
+    db = coverdb.load(db_path, json_path)
+    try:
+        assert db.get(20) == APPS["20"]
+    finally:
+        db.close()
+
+
+def test_invalid_database_without_json(tmp_path):
+    db_path = tmp_path / "missingcoverdb.bin"
+    db_path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        coverdb.load(str(db_path), str(tmp_path / "missing.json"))
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+
+import missing_cover_downloader
+
+
+def cover(cover_id, score):
+    return {"id": cover_id, "score": score, "url": "u{}".format(cover_id), "author": {"name": "a"}}
+
+
+def args():
+    return argparse.Namespace(no_cache=True, cache_ttl=86400, cache_size=100, rate=1000.0, request_budget=None,
+                              no_cover_store=True, cover_store_size=500, downloads=2, max_downloads=4,
+                              connections=10, connections_per_host=None, dns_cache_ttl=300,
+                              styles=None, min_score=None)
+
+
+def run(monkeypatch, tmp_path, working_ids):
+    log = []
+
+    async def query(appid, session, styles=None, cache=None, limiter=None, kind="portrait"):
+        if isinstance(appid, list):
+            log.append("batch")
+            return {"success": True, "data": [(appid[0], {"success": True, "data": [cover(1, 1), cover(5, 5), cover(3, 3)]})]}
+        log.append("query")
+        # the per-app query also returns the candidates that already failed
+        return {"success": True, "data": [cover(5, 5), cover(4, 4), cover(3, 3), cover(2, 2)]}
+
+    async def stream(url, gridpath, appid, session, writer, chunk_size=65536, kind="portrait", on_saved=None):
+        log.append(url)
+        if url in working_ids:
+            on_saved()
+            return True
+        return False
+
+    monkeypatch.setattr(missing_cover_downloader, "query_cover_for_apps", query)
+    monkeypatch.setattr(missing_cover_downloader, "stream_image", stream)
+    targets = {"portrait": {10: [str(tmp_path)]}}
+    downloaded = asyncio.run(missing_cover_downloader.download_covers(targets, {10: "Game"}, args()))
+    return downloaded, log
+
+
+def test_candidates_are_tried_before_the_app_is_queried_again(monkeypatch, tmp_path):
+    downloaded, log = run(monkeypatch, tmp_path, {"u4"})
+    assert downloaded == 1
+    # retained candidates by score, then only the covers not tried yet
+    assert log == ["batch", "u5", "u3", "u1", "query", "u4"]
+
+
+def test_no_query_when_a_candidate_succeeds(monkeypatch, tmp_path):
+    downloaded, log = run(monkeypatch, tmp_path, {"u3"})
+    assert downloaded == 1
+    assert log == ["batch", "u5", "u3"]
+
+
+def test_all_covers_failing(monkeypatch, tmp_path):
+    downloaded, log = run(monkeypatch, tmp_path, set())
+    assert downloaded == 0
+    assert log == ["batch", "u5", "u3", "u1", "query", "u4", "u2"]
@@ -0,0 +1,77 @@
+import json
+
+from download_journal import DownloadJournal
+
+
+def test_resume(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    grid = str(tmp_path)
+    journal = DownloadJournal(path)
+    journal.start({10: "A", 20: "B", 30: "C", 40: "D"},
+                  {"portrait": {10: [grid], 20: [grid], 30: [grid]}, "hero": {40: [grid]}})
+    journal.record(10, "chosen", cover_id=1, url="https://example.com/1.png", author="x")
+    journal.record(10, "downloaded")
+    journal.record(20, "chosen", cover_id=2, url="https://example.com/2.png", author="y")
+    journal.record(30, "failed", reason="no_cover")
+    journal.record(40, "failed", "hero", reason="download")
+    journal.close()
+    (tmp_path / "10p.jpg").write_bytes(b"x")
+
+    resumed = DownloadJournal(path)
+    assert resumed.load()
+    assert resumed.apps == {10: "A", 20: "B", 30: "C", 40: "D"}
+    assert resumed.targets["hero"] == {40: [grid]}
+    assert resumed.is_done(10, [grid])
+    assert not resumed.is_done(20, [grid])
+    assert resumed.state(20)["url"] == "https://example.com/2.png"
+    assert resumed.is_done(30, grid)
+    # failed downloads are tried again, kinds are tracked separately
+    assert not resumed.is_done(40, [grid], "hero")
+    assert resumed.state(40) is None
+    resumed.record(20, "downloaded")
+    resumed.close()
+    with open(path, encoding="utf-8") as f:
+        assert json.loads(f.readlines()[-1]) == {"appid": 20, "kind": "portrait", "state": "downloaded"}
+
+
+def test_downloaded_cover_missing_from_a_grid(tmp_path):
+    first, second = tmp_path / "a", tmp_path / "b"
+    first.mkdir()
+    second.mkdir()
+    (first / "10p.png").write_bytes(b"x")
+    journal = DownloadJournal(str(tmp_path / "journal.jsonl"))
+    journal.start({10: "A"}, {"portrait": {10: [str(first), str(second)]}})
+    journal.record(10, "downloaded")
+    assert not journal.is_done(10, [str(first), str(second)])
+    assert journal.is_done(10, [str(first)])
+    journal.close()
+
+
+def test_old_journal_and_cut_off_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(json.dumps({"run": {"apps": {"10": "A"}, "grids": {"10": ["grid"]}}}) + "\n"
+                    + json.dumps({"appid": 10, "state": "failed", "reason": "low_score"}) + "\n"
+                    + '{"appid": 10, "sta', encoding="utf-8")
+    journal = DownloadJournal(str(path))
+    assert journal.load()
+    assert journal.targets == {"portrait": {10: ["grid"]}}
+    assert journal.is_done(10, ["grid"])
+    journal.close()
+
+
+def test_restart_closes_the_resumed_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = DownloadJournal(path)
+    assert not journal.load()
+    assert journal.f is None
+    journal.start({10: "A"})
+    journal.close()
+    assert journal.load()
+    resumed = journal.f
+    journal.start({20: "B"})
+    assert resumed.closed
+    journal.close()
+    reloaded = DownloadJournal(path)
+    assert reloaded.load()
+    assert reloaded.apps == {20: "B"}
+    reloaded.close()
@@ -0,0 +1,114 @@
+import contextlib
+import os
+
+import pytest
+
+import grid_index
+from grid_index import GridIndex, asset_filename, parse_filename
+
+
+@pytest.mark.parametrize("filename, asset", [
+    ("10p.png", (10, "portrait")),
+    ("10.jpg", (10, "landscape")),
+    ("10_hero.WEBP", (10, "hero")),
+    ("10_logo.jpeg", (10, "logo")),
+    ("10p.png.part", None),
+    ("10_icon.png", None),
+    ("abc.png", None),
+])
+def test_parse_filename(filename, asset):
+    assert parse_filename(filename) == asset
+
+
+def test_asset_filename():
+    assert asset_filename(10, "portrait", ".png") == "10p.png"
+    assert asset_filename(10, "landscape", "jpg") == "10.jpg"
+    assert parse_filename(asset_filename(10, "hero", "webp")) == (10, "hero")
+
+
+@pytest.fixture
+def index(tmp_path):
+    grid = tmp_path / "grid"
+    grid.mkdir()
+    return GridIndex(str(grid), str(tmp_path / "index.json"))
+
+
+def test_scan_and_find(index):
+    grid = index.gridpath
+    for name in ("10p.png", "20p.jpg", "10.png", "10_hero.png", "notes.txt"):
+        with open(os.path.join(grid, name), "wb") as f:
+            f.write(b"x")
+    os.mkdir(os.path.join(grid, "30p.png"))
+    assert index.scan() == 4
+    assert index.find() == {10: ["10p.png"], 20: ["20p.jpg"]}
+    assert index.find("landscape") == {10: ["10.png"]}
+    assert index.find("logo") == {}
+
+
+def test_rescan_checks_only_new_names(index, monkeypatch):
+    # the folder mtime is always recent in a test, so the scan is never skipped
+    grid = index.gridpath
+    for name in ("10p.png", "20p.png"):
+        with open(os.path.join(grid, name), "wb") as f:
+            f.write(b"x")
+    assert index.scan() == 2
+    assert index.scan() == 0
+    checked = []
+    scandir = os.scandir
+
+    class Entry:
+        def __init__(self, entry):
+            self.entry = entry
+            self.name = entry.name
+
+        def is_file(self):
+            checked.append(self.name)
+            return self.entry.is_file()
+
+        def stat(self):
+            checked.append(self.name)
+            return self.entry.stat()
+
+    @contextlib.contextmanager
+    def checked_scandir(path):
+        with scandir(path) as it:
+            yield (Entry(entry) for entry in it)
+
+    monkeypatch.setattr(os, "scandir", checked_scandir)
+    with open(os.path.join(grid, "30p.png"), "wb") as f:
+        f.write(b"x")
+    os.remove(os.path.join(grid, "20p.png"))
+    # one file added and one removed
+    assert index.scan() == 2
+    assert checked == ["30p.png"]
+    assert index.find() == {10: ["10p.png"], 30: ["30p.png"]}
+    index.remove("30p.png")
+    assert index.find() == {10: ["10p.png"]}
+    assert not os.path.exists(os.path.join(grid, "30p.png"))
+
+
+def test_scan_is_skipped_for_an_unchanged_folder(index, monkeypatch):
+    with open(os.path.join(index.gridpath, "10p.png"), "wb") as f:
+        f.write(b"x")
+    mtime = os.stat(index.gridpath).st_mtime_ns
+    monkeypatch.setattr(grid_index, "MTIME_GRANULARITY", -1)
+    assert index.scan() == 1
+    assert index.mtime == mtime
+    os.remove(os.path.join(index.gridpath, "10p.png"))
+    os.utime(index.gridpath, ns=(mtime, mtime))
+    # nothing is read, the index still holds the removed file
+    assert index.scan() == 0
+    assert index.find() == {10: ["10p.png"]}
+
+
+def test_save_and_load(index, tmp_path):
+    with open(os.path.join(index.gridpath, "10_logo.png"), "wb") as f:
+        f.write(b"x")
+    index.scan()
+    index.save()
+    loaded = GridIndex(index.gridpath, index.path)
+    loaded.load()
+    assert loaded.files == index.files
+    other = GridIndex(str(tmp_path), index.path)
+    other.load()
+    assert other.files == {}
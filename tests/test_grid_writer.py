@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import pytest
+
+from grid_writer import GridWriter
+
+
+async def write(writer, path, data, saved=None, committed=None):
+    f = await writer.open(path)
+    await f.write(data)
+    await writer.commit(f, None if committed is None else lambda: committed.append(path),
+                        None if saved is None else lambda: saved.append(path))
+    return f
+
+
+def test_files_appear_after_the_batch_is_synced(tmp_path):
+    async def run():
+        writer = GridWriter(sync_batch=3)
+        saved, committed = [], []
+        paths = [str(tmp_path / "{}p.png".format(i)) for i in range(4)]
+        for path in paths[:2]:
+            await write(writer, path, b"data", saved, committed)
+        # queued files only exist as temp files and are not reported yet
+        assert sorted(os.listdir(tmp_path)) == ["0p.png.part", "1p.png.part"]
+        assert saved == []
+        await write(writer, paths[2], b"data", saved, committed)
+        assert saved == committed == paths[:3]
+        await write(writer, paths[3], b"data", saved, committed)
+        await writer.close()
+        return saved
+    assert asyncio.run(run()) == [str(tmp_path / "{}p.png".format(i)) for i in range(4)]
+    assert sorted(os.listdir(tmp_path)) == ["0p.png", "1p.png", "2p.png", "3p.png"]
+    assert (tmp_path / "3p.png").read_bytes() == b"data"
+
+
+def test_discard(tmp_path):
+    async def run():
+        writer = GridWriter()
+        f = await writer.open(str(tmp_path / "10p.png"))
+        await f.write(b"partial")
+        await writer.discard(f)
+        await writer.close()
+    asyncio.run(run())
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_sync_removes_the_temp_files_of_the_batch(tmp_path):
+    async def run():
+        writer = GridWriter(sync_batch=10)
+        saved = []
+        await write(writer, str(tmp_path / "1p.png"), b"a", saved)
+        # the rename of the second file fails since its folder is gone
+        await write(writer, str(tmp_path / "gone" / "2p.png"), b"b", saved)
+        await write(writer, str(tmp_path / "3p.png"), b"c", saved)
+        os.replace(str(tmp_path / "gone" / "2p.png.part"), str(tmp_path / "moved.part"))
+        os.rmdir(str(tmp_path / "gone"))
+        with pytest.raises(OSError):
+            await writer.flush()
+        await writer.close()
+        return saved
+    (tmp_path / "gone").mkdir()
+    assert asyncio.run(run()) == []
+    assert sorted(os.listdir(tmp_path)) == ["1p.png", "moved.part"]
+
+
+def test_remove_stale(tmp_path):
+    (tmp_path / "10p.png.part").write_bytes(b"x")
+    (tmp_path / "10p.png").write_bytes(b"x")
+    GridWriter.remove_stale(str(tmp_path))
+    assert os.listdir(tmp_path) == ["10p.png"]
@@ -0,0 +1,40 @@
+import os
+import time
+
+from http_cache import HttpCache
+
+
+def test_put_and_get(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    assert cache.get("https://example.com/a") is None
+    cache.put("https://example.com/a", b"body", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    meta, body = cache.get("https://example.com/a")
+    assert body == b"body"
+    assert cache.is_fresh(meta)
+    assert cache.validators(meta) == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_expiry_and_refresh(tmp_path):
+    cache = HttpCache(str(tmp_path), ttl=60)
+    cache.put("u", b"x", {})
+    meta, _ = cache.get("u")
+    meta["time"] -= 120
+    assert not cache.is_fresh(meta)
+    assert cache.validators(meta) == {}
+    cache.refresh("u", meta)
+    assert cache.is_fresh(cache.get("u")[0])
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = HttpCache(str(tmp_path), max_size=3500)
+    for i in range(3):
+        cache.put("u{}".format(i), b"x" * 1000, {})
+        # mtimes of the bodies must differ for the lru order
+        past = time.time() - 100 + i
+        os.utime(cache._paths("u{}".format(i))[0], (past, past))
+    cache.get("u0")
+    cache.put("u3", b"x" * 1000, {})
+    assert cache.get("u1") is None
+    assert [cache.get(url) is not None for url in ("u0", "u2", "u3")] == [True, True, True]
+    assert cache.size == 3000
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import io
+import os
+
+import pytest
+
+import image_normalizer
+from image_normalizer import ImageNormalizer, normalize_image, target_size
+from missing_cover_downloader import jpeg_quality
+
+PORTRAIT = {(600, 900)}
+HERO = {(1920, 620), (3840, 1240), (1600, 650)}
+
+
+@pytest.mark.parametrize("size, sizes, expected", [
+    ((1200, 1800), PORTRAIT, (600, 900)),
+    ((601, 901), PORTRAIT, (600, 900)),
+    ((300, 450), PORTRAIT, None),
+    ((1200, 1200), PORTRAIT, None),
+    ((3840, 1240), HERO, (3840, 1240)),
+    ((7680, 2480), HERO, (3840, 1240)),
+    ((3200, 1300), HERO, (1600, 650)),
+    ((100, 0), HERO, None),
+])
+def test_target_size(size, sizes, expected):
+    assert target_size(size, sizes) == expected
+
+
+def test_jpeg_quality_range():
+    assert jpeg_quality("80") == 80
+    for value in ("0", "96"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            jpeg_quality(value)
+
+
+@pytest.fixture
+def Image():
+    return pytest.importorskip("PIL.Image")
+
+
+def encode(Image, mode, size, fmt="PNG", noise=True):
+    image = Image.frombytes(mode, size, os.urandom(size[0] * size[1] * len(mode))) if noise else Image.new(mode, size)
+    out = io.BytesIO()
+    image.save(out, fmt)
+    return out.getvalue()
+
+
+def test_resize_keeps_format(Image):
+    data, ext = normalize_image(encode(Image, "RGBA", (1200, 1800)), (600, 900))
+    assert ext == "png"
+    assert Image.open(io.BytesIO(data)).size == (600, 900)
+    data, ext = normalize_image(encode(Image, "RGB", (1200, 1800), "JPEG"), (600, 900))
+    assert ext == "jpg"
+    assert Image.open(io.BytesIO(data)).size == (600, 900)
+
+
+def test_reencodes_only_opaque_images_as_jpeg(Image):
+    data, ext = normalize_image(encode(Image, "RGB", (600, 900)), None, 80)
+    assert ext == "jpg"
+    assert Image.open(io.BytesIO(data)).format == "JPEG"
+    transparent = encode(Image, "RGBA", (600, 900))
+    assert normalize_image(transparent, None, 80) == (transparent, "png")
+
+
+def test_reencoding_that_does_not_save_space_keeps_the_original(Image):
+    # a single color png is smaller than any jpeg of it
+    original = encode(Image, "RGB", (600, 900), noise=False)
+    assert normalize_image(original, None, 95) == (original, "png")
+
+
+def test_webp_keeps_its_extension(Image):
+    features = pytest.importorskip("PIL.features")
+    if not features.check("webp"):
+        pytest.skip("Pillow without webp support")
+    data, ext = normalize_image(encode(Image, "RGBA", (1200, 1800), "WEBP"), (600, 900))
+    assert ext == "webp"
+    assert Image.open(io.BytesIO(data)).size == (600, 900)
+
+
+def test_decompression_bomb_is_a_value_error(Image, monkeypatch):
+    data = encode(Image, "RGB", (200, 300), noise=False)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(ValueError):
+        normalize_image(data, (20, 30))
+
+
+def test_unsupported_format(Image):
+    with pytest.raises(ValueError):
+        normalize_image(encode(Image, "RGB", (20, 30), "GIF"))
+
+
+def test_normalizer_pool(Image):
+    normalizer = ImageNormalizer(max_workers=1, jpeg_quality=80)
+    try:
+        png = encode(Image, "RGB", (1200, 1800))
+        assert normalizer.reencodes(png)
+        assert not normalizer.reencodes(encode(Image, "RGB", (20, 30), "JPEG"))
+        assert normalizer.target_size((1200, 1800), PORTRAIT) == (600, 900)
+        assert normalizer.target_size((1200, 1800), None) is None
+        data, ext = asyncio.run(normalizer.normalize(png, (600, 900)))
+        assert ext == "jpg"
+        assert Image.open(io.BytesIO(data)).size == (600, 900)
+    finally:
+        normalizer.close()
+
+
+def test_without_pillow(monkeypatch):
+    monkeypatch.setattr(image_normalizer, "Image", None)
+    assert not ImageNormalizer.available()
@@ -0,0 +1,80 @@
+import io
+import struct
+
+import pytest
+
+from missing_cover_downloader import quick_get_image_size, sniff_image_size
+
+PNG_SIGNATURE = b'\211PNG\r\n\032\n'
+
+
+def png_header(width, height):
+    return PNG_SIGNATURE + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x06\0\0\0"
+
+
+def jpeg_header(width, height):
+    # SOI, an APP0 segment, a DHT segment that must be skipped and the SOF0 segment
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0\x01\x01\0\0\x01\0\x01\0\0"
+    dht = b"\xff\xc4" + struct.pack(">H", 5) + b"\0\0\0"
+    sof = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, height, width) + b"\x03" + b"\0" * 9
+    return b"\xff\xd8" + app0 + dht + sof
+
+
+def riff(chunk, payload):
+    data = chunk + struct.pack("<I", len(payload)) + payload
+    return b"RIFF" + struct.pack("<I", len(data) + 4) + b"WEBP" + data
+
+
+def webp_lossy(width, height):
+    return riff(b"VP8 ", b"\x10\x02\x00" + b"\x9d\x01\x2a" + struct.pack("<HH", width, height) + b"\0" * 10)
+
+
+def webp_lossless(width, height):
+    bits = (width - 1) | (height - 1) << 14
+    return riff(b"VP8L", b"\x2f" + struct.pack("<I", bits) + b"\0" * 10)
+
+
+def webp_extended(width, height):
+    return riff(b"VP8X", b"\x10\0\0\0" + (width - 1).to_bytes(3, "little") + (height - 1).to_bytes(3, "little"))
+
+
+@pytest.mark.parametrize("header", [png_header(600, 900), jpeg_header(600, 900), webp_lossy(600, 900),
+                                    webp_lossless(600, 900), webp_extended(600, 900)])
+def test_sniff_complete_header(header):
+    assert sniff_image_size(header) == (600, 900)
+    assert quick_get_image_size(header + b"\0" * 100) == (600, 900)
+
+
+@pytest.mark.parametrize("header", [png_header(920, 430), jpeg_header(920, 430), webp_lossy(920, 430),
+                                    webp_lossless(920, 430), webp_extended(920, 430)])
+def test_sniff_needs_more_data(header):
+    # every prefix is either undecided or already has the right size
+    for length in range(len(header)):
+        assert sniff_image_size(header[:length]) in (None, (920, 430))
+    assert sniff_image_size(header[:10]) is None
+
+
+def test_webp_sizes_beyond_16_bits():
+    assert sniff_image_size(webp_extended(3840, 70000)) == (3840, 70000)
+
+
+@pytest.mark.parametrize("data", [b"GIF89a\x01\0\x01\0", b"<html>", b"\xff\xd9",
+                                  b"RIFF\0\0\0\0WAVEfmt " + b"\0" * 30, riff(b"ALPH", b"\0" * 30)])
+def test_sniff_rejects_other_formats(data):
+    with pytest.raises(ValueError):
+        sniff_image_size(data)
+
+
+def test_sniff_images_of_pillow():
+    Image = pytest.importorskip("PIL.Image")
+    features = pytest.importorskip("PIL.features")
+    formats = [("PNG", {}), ("JPEG", {})]
+    if features.check("webp"):
+        formats += [("WEBP", {}), ("WEBP", {"lossless": True})]
+    for fmt, options in formats:
+        for mode in ("RGB", "RGBA"):
+            if fmt == "JPEG" and mode == "RGBA":
+                continue
+            out = io.BytesIO()
+            Image.new(mode, (460, 215)).save(out, fmt, **options)
+            assert sniff_image_size(out.getvalue()[:2048]) == (460, 215)
@@ -0,0 +1,64 @@
+import pytest
+
+import license_parser
+import synthetic
+from license_parser import RandomStream
+
+
+def scalar_chars(seed, length):
+    stream = RandomStream()
+    stream.set_seed(seed)
+    return bytes(stream.random_char() for _ in range(length))
+
+
+@pytest.fixture(params=["numpy", "python"])
+def keystream_impl(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(license_parser, "numpy", None)
+    return request.param
+
+
+@pytest.mark.parametrize("seed", [0, 1, 1000, 123456789])
+def test_keystream_matches_scalar_lcg(keystream_impl, seed):
+    stream = RandomStream()
+    stream.set_seed(seed)
+    assert stream.random_chars(5000) == scalar_chars(seed, 5000)
+
+
+def test_keystream_across_blocks(keystream_impl, monkeypatch):
+    # small blocks make the state carry over between them
+    monkeypatch.setattr(license_parser, "BLOCK_SIZE", 7)
+    stream = RandomStream()
+    stream.set_seed(42)
+    assert stream.random_chars(100) + stream.random_chars(50) == scalar_chars(42, 150)
+
+
+def test_decrypt_is_its_own_inverse(keystream_impl):
+    data = bytes(range(256)) * 3
+    encrypted = RandomStream().decrypt_data(1000, data)
+    assert encrypted != data
+    assert bytes(RandomStream().decrypt_data(1000, bytes(encrypted))) == data
+
+
+def test_parse_and_cache(tmp_path):
+    path = tmp_path / "licensecache"
+    path.write_bytes(synthetic.licensecache_dumps(25, 1000, seed=3))
+    cache_path = tmp_path / "cache" / "licensecache.bin"
+    parsed = license_parser.parse(str(path), 1000, str(cache_path))
+    assert [license.package_id for license in parsed.licenses] == list(range(25))
+    assert cache_path.is_file()
+    cached = license_parser.parse(str(path), 1000, str(cache_path))
+    assert cached == parsed
+    assert not (tmp_path / "cache" / "licensecache.bin.tmp").exists()
+
+
+def test_stale_cache_is_ignored(tmp_path):
+    path = tmp_path / "licensecache"
+    path.write_bytes(synthetic.licensecache_dumps(5, 1000, seed=3))
+    cache_path = tmp_path / "licensecache.bin"
+    license_parser.parse(str(path), 1000, str(cache_path))
+    cache_path.write_bytes(b"0 0 1000\n")
+    # a cache written for another key is ignored
+    assert len(license_parser.parse(str(path), 1000, str(cache_path)).licenses) == 5
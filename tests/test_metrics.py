@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+import missing_cover_downloader
+from metrics import Metrics
+
+
+def test_prometheus_types():
+    metrics = Metrics()
+    metrics.inc("retries_total")
+    metrics.inc("retries_total", 2)
+    metrics.set("owned_apps", 10, account="1000")
+    metrics.set("owned_apps", 12, account="1000")
+    metrics.observe("http_request_seconds", 0.2, kind="image")
+    with metrics.phase("download"):
+        pass
+    text = metrics.to_prometheus()
+    assert "# TYPE missing_cover_retries_total counter\nmissing_cover_retries_total 3\n" in text
+    assert '# TYPE missing_cover_owned_apps gauge\nmissing_cover_owned_apps{account="1000"} 12\n' in text
+    assert "# TYPE missing_cover_http_request_seconds histogram" in text
+    assert 'missing_cover_http_request_seconds_bucket{kind="image",le="0.25"} 1' in text
+    assert 'missing_cover_http_request_seconds_bucket{kind="image",le="0.1"} 0' in text
+    assert 'missing_cover_phase_seconds{phase="download"}' in text
+
+
+def test_write_json(tmp_path):
+    metrics = Metrics()
+    metrics.set("owned_packages", 5)
+    metrics.inc("covers_downloaded_total", kind="portrait")
+    path = tmp_path / "metrics" / "run.json"
+    metrics.write_json(str(path))
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["gauges"] == [{"name": "owned_packages", "labels": {}, "value": 5}]
+    assert data["counters"] == [{"name": "covers_downloaded_total", "labels": {"kind": "portrait"}, "value": 1}]
+
+
+def test_retries_exclude_the_last_attempt(monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(missing_cover_downloader, "METRICS", metrics)
+
+    async def fail():
+        raise OSError("reset")
+
+    assert asyncio.run(missing_cover_downloader.retry_func_async(fail, lambda ex: None, retry=3)) == (None, False)
+    assert metrics.counters[("retries_total", ())] == 2
@@ -0,0 +1,118 @@
+import pytest
+from steam.protobufs.steammessages_clientserver_appinfo_pb2 import CMsgClientPICSChangesSinceResponse
+
+import missing_cover_downloader
+import pics_store
+from missing_cover_downloader import SteamDataReaderRemote
+
+
+class Client:
+    def __init__(self, changes):
+        self.changes = changes
+        self.since = []
+        self.requested = []
+
+    def get_changes_since(self, since, app_changes=True, package_changes=True):
+        self.since.append(since)
+        return self.changes
+
+    def get_product_info(self, apps=(), packages=()):
+        self.requested.append((list(apps), list(packages)))
+        return {"apps": {appid: {"common": {"type": "Game", "name": str(appid), "icon": "x"}} for appid in apps},
+                "packages": {pkgid: {"appids": {}} for pkgid in packages}}
+
+    def sleep(self, seconds):
+        pass
+
+
+def changes(current, apps=(), packages=(), **force):
+    response = CMsgClientPICSChangesSinceResponse(current_change_number=current, **force)
+    for appid in apps:
+        response.app_changes.add(appid=appid, change_number=current)
+    for pkgid in packages:
+        response.package_changes.add(packageid=pkgid, change_number=current)
+    return response
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "pics_store.json")
+    monkeypatch.setattr(missing_cover_downloader, "PICS_STORE", path)
+    store = pics_store.PicsStore(path)
+    store.change_number = 100
+    store.apps = {1: {}, 2: {}}
+    store.packages = {10: {}, 11: {}}
+    store.save()
+    return path
+
+
+def sync(response):
+    reader = SteamDataReaderRemote(Client(response))
+    reader.sync_store()
+    # a second call within the run does nothing
+    reader.sync_store()
+    assert reader.client.since == [100]
+    saved = pics_store.PicsStore(reader.store.path)
+    saved.load()
+    return reader.store, saved
+
+
+def stored(store):
+    return store.change_number, sorted(store.apps), sorted(store.packages)
+
+
+def test_changed_entries_are_dropped(store_path):
+    store, saved = sync(changes(105, apps=[1], packages=[11]))
+    assert stored(store) == stored(saved) == (105, [2], [10])
+
+
+def test_full_app_update(store_path):
+    store, saved = sync(changes(105, apps=[1], packages=[11], force_full_app_update=True))
+    assert stored(store) == stored(saved) == (105, [], [10])
+
+
+def test_full_package_update(store_path):
+    store, saved = sync(changes(105, apps=[1], packages=[11], force_full_package_update=True))
+    assert stored(store) == stored(saved) == (105, [2], [])
+
+
+def test_full_update(store_path):
+    store, saved = sync(changes(105, force_full_update=True))
+    assert stored(store) == stored(saved) == (105, [], [])
+
+
+def test_failed_request_reloads_everything(store_path):
+    store, saved = sync(None)
+    assert stored(store) == (0, [], [])
+    # the store on disk is only replaced once the details are loaded again
+    assert stored(saved) == (100, [1, 2], [10, 11])
+
+
+def test_saved_only_when_the_change_number_advanced(store_path, monkeypatch):
+    saves = []
+    monkeypatch.setattr(pics_store.PicsStore, "save", lambda self: saves.append(self.change_number))
+    sync(changes(100))
+    assert saves == []
+    sync(changes(101))
+    assert saves == [101]
+
+
+def test_only_missing_details_are_requested(store_path):
+    reader = SteamDataReaderRemote(Client(changes(105, apps=[1])))
+    apps = reader.get_app_details([1, 2])
+    assert reader.client.requested == [([1], [])]
+    # apps are stored projected to the fields used to find missing covers
+    assert apps[1] == {"common": {"type": "Game", "name": "1"}}
+    assert apps[2] == {}
+    saved = pics_store.PicsStore(store_path)
+    saved.load()
+    assert stored(saved) == (105, [1, 2], [10, 11])
+
+
+def test_first_sync_starts_from_scratch(tmp_path, monkeypatch):
+    monkeypatch.setattr(missing_cover_downloader, "PICS_STORE", str(tmp_path / "pics_store.json"))
+    reader = SteamDataReaderRemote(Client(changes(105, apps=[1])))
+    reader.sync_store()
+    assert reader.client.since == [0]
+    assert stored(reader.store) == (105, [], [])
+    assert (tmp_path / "pics_store.json").is_file()
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from rate_limiter import RateLimiter, BudgetExceeded, parse_retry_after
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("120", 120.0),
+    ("0.5", 0.5),
+    ("-3", 0.0),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    date = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(date, usegmt=True)) <= 30
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    assert parse_retry_after(format_datetime(past, usegmt=True)) == 0.0
+
+
+def test_budget():
+    async def run():
+        limiter = RateLimiter(max_rate=1000, budget=3)
+        for _ in range(3):
+            await limiter.acquire()
+        with pytest.raises(BudgetExceeded):
+            await limiter.acquire()
+        return limiter.used
+    assert asyncio.run(run()) == 3
+
+
+def test_burst_then_rate():
+    async def run():
+        limiter = RateLimiter(max_rate=50, burst=5)
+        start = time.monotonic()
+        for _ in range(10):
+            await limiter.acquire()
+        return time.monotonic() - start
+    # the burst is free, the other 5 requests wait for tokens at 50 per second
+    assert 0.08 < asyncio.run(run()) < 1
+
+
+def test_rate_adapts():
+    limiter = RateLimiter(max_rate=4, min_rate=0.5, increase=1)
+    limiter.on_throttled()
+    assert limiter.rate == 2
+    assert limiter.blocked_until > time.monotonic()
+    limiter.on_error()
+    limiter.on_error()
+    limiter.on_error()
+    assert limiter.rate == 0.5
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 4
@@ -0,0 +1,84 @@
+import mmap
+
+import missing_cover_downloader
+import vdf
+
+
+def test_appinfo_lazy_matches_full_decode(appinfo_data):
+    full = vdf.appinfo_loads(appinfo_data)
+    lazy = vdf.appinfo_lazy_loads(appinfo_data)
+    assert len(lazy) == len(full)
+    assert list(lazy) == list(full)
+    for appid, app in full.items():
+        assert lazy[appid] == app
+
+
+def test_packageinfo_lazy_matches_full_decode(packageinfo_data):
+    full = vdf.packageinfo_loads(packageinfo_data)
+    lazy = vdf.packageinfo_lazy_loads(packageinfo_data)
+    assert list(lazy) == list(full)
+    for packageid, package in full.items():
+        assert lazy[packageid] == package
+
+
+def test_lazy_decodes_only_accessed_entries(appinfo_data):
+    lazy = vdf.appinfo_lazy_loads(appinfo_data)
+    appid = next(iter(lazy))
+    assert lazy.get(appid)["appid"] == appid
+    assert lazy.get(0) is None
+    assert list(lazy._decoded) == [appid]
+
+
+def test_index_change_numbers(appinfo_data):
+    index = vdf.appinfo_index(appinfo_data)
+    lazy = vdf.appinfo_lazy_loads(appinfo_data)
+    for appid, (_, _, change_number) in index.items():
+        assert lazy.change_number(appid) == change_number
+
+
+def test_lazy_reads_from_mmap(tmp_path, appinfo_data):
+    path = tmp_path / "appinfo.vdf"
+    path.write_bytes(appinfo_data)
+    full = vdf.appinfo_loads(appinfo_data)
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        lazy = vdf.appinfo_lazy_loads(data)
+        for appid in list(full)[:20]:
+            assert lazy[appid] == full[appid]
+    finally:
+        del lazy
+        data.close()
+
+
+def test_close_releases_the_map(tmp_path, appinfo_data):
+    path = tmp_path / "appinfo.vdf"
+    path.write_bytes(appinfo_data)
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    lazy = vdf.appinfo_lazy_loads(data)
+    appid = next(iter(lazy))
+    app = lazy[appid]
+    lazy.close()
+    assert data.closed
+    assert lazy[appid] == app
+    # buffers that are not mapped have nothing to release
+    vdf.appinfo_lazy_loads(appinfo_data).close()
+
+
+def test_reader_maps_the_appcache_again_after_close(tmp_path, monkeypatch, appinfo_data, packageinfo_data):
+    monkeypatch.setattr(missing_cover_downloader, "APPINFO_CACHE", str(tmp_path / "appinfo_cache.json"))
+    (tmp_path / "appcache").mkdir()
+    (tmp_path / "appcache" / "appinfo.vdf").write_bytes(appinfo_data)
+    (tmp_path / "appcache" / "packageinfo.vdf").write_bytes(packageinfo_data)
+    reader = missing_cover_downloader.SteamDataReaderLocal(str(tmp_path))
+    packageids = list(vdf.packageinfo_loads(packageinfo_data))[:5]
+    packages = reader.get_package_details(packageids)
+    apps = reader.get_app_details(reader.get_appids_from_packages(packages))
+    appinfo, packageinfo = reader.appinfo._data, reader.packageinfo._data
+    reader.close()
+    assert appinfo.closed and packageinfo.closed
+    assert reader.appinfo is None and reader.packageinfo is None
+    assert reader.get_package_details(packageids) == packages
+    assert reader.get_app_details(list(apps)) == apps
+    reader.close()
@@ -0,0 +1,23 @@
+import vdf
+from appinfo_cache import PROJECTION_PATHS
+from pics_store import project
+
+
+def test_parallel_load_matches_full_decode(tmp_path, appinfo_data):
+    path = tmp_path / "appinfo.vdf"
+    path.write_bytes(appinfo_data)
+    full = vdf.appinfo_loads(appinfo_data)
+    assert vdf.appinfo_parallel_load(str(path), workers=2) == full
+
+
+def test_parallel_projection_of_some_apps(tmp_path, appinfo_data):
+    path = tmp_path / "appinfo.vdf"
+    path.write_bytes(appinfo_data)
+    full = vdf.appinfo_loads(appinfo_data)
+    app_ids = list(full)[::3] + [0]
+    loaded = vdf.appinfo_parallel_load(str(path), 2, app_ids, PROJECTION_PATHS)
+    # unknown apps are left out
+    assert sorted(loaded) == sorted(app_ids[:-1])
+    for app_id, app in loaded.items():
+        assert app == project(full[app_id], PROJECTION_PATHS)
+    assert vdf.appinfo_parallel_load(str(path), 2, [0]) == {}
@@ -0,0 +1,37 @@
+import pytest
+
+import vdf
+from appinfo_cache import PROJECTION_PATHS
+from pics_store import project
+
+
+def test_projection_matches_full_decode(appinfo_data):
+    full = vdf.appinfo_loads(appinfo_data)
+    lazy = vdf.appinfo_lazy_loads(appinfo_data)
+    for appid, app in full.items():
+        assert lazy.project(appid, PROJECTION_PATHS) == project(app, PROJECTION_PATHS)
+
+
+def test_projection_of_subtree_and_missing_keys():
+    blob = vdf.binary_dumps({"appinfo": {
+        "appid": 10,
+        "common": {"name": "Game", "library_assets": {"library_capsule": "en"}, "icon": "abc"},
+        "extended": {"developer": "dev"},
+    }})
+    paths = [("appinfo", "common", "name"), ("appinfo", "common", "library_assets"),
+             ("appinfo", "common", "header_image"), ("appinfo", "config", "installdir")]
+    projected, end = vdf.binary_project_at(blob, 0, paths)
+    assert projected == {"appinfo": {"common": {"name": "Game", "library_assets": {"library_capsule": "en"}}}}
+    assert end == vdf.binary_loads_at(blob, 0)[1]
+
+
+def test_skip_matches_decode_end(packageinfo_data):
+    index = vdf.packageinfo_index(packageinfo_data)
+    for offset, size, _ in index.values():
+        assert vdf.binary_skip_at(packageinfo_data, offset) == vdf.binary_loads_at(packageinfo_data, offset)[1]
+        assert vdf.binary_skip_at(packageinfo_data, offset) == offset + size
+
+
+def test_projection_rejects_non_dict_mapper():
+    with pytest.raises(TypeError):
+        vdf.binary_project_at(b"\x08", 0, [("a",)], mapper=list)
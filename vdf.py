@@ -4,9 +4,12 @@ Module for deserializing/serializing to and from VDF
 __version__ = "3.2"
 __author__ = "Rossen Georgiev"
 
+import os
 import re
 import sys
+import mmap
 import struct
+from concurrent.futures import ProcessPoolExecutor
 from binascii import crc32
 from io import StringIO as unicodeIO
 from collections import namedtuple
@@ -282,7 +285,8 @@ def binary_loads(s, mapper=dict, merge_duplicate_keys=True, alt_format=False):
 def binary_loads_at(s, idx=0, mapper=dict, merge_duplicate_keys=True, alt_format=False):
     """
     Deserialize ``s`` (``bytes`` containing a VDF in "binary form")
-    to a Python object.
+    to a Python object, starting at ``idx``. ``s`` may also be a ``bytearray``
+    or an ``mmap``, which lets callers decode in place without copying.
 
     ``mapper`` specifies the Python object used after deserializetion. ``dict` is
     used by default. Alternatively, ``collections.OrderedDict`` can be used if you
@@ -292,7 +296,7 @@ def binary_loads_at(s, idx=0, mapper=dict, merge_duplicate_keys=True, alt_format
     same key into one instead of overwriting. You can se this to ``False`` if you are
     using ``VDFDict`` and need to preserve the duplicates.
     """
-    if not isinstance(s, bytes):
+    if not isinstance(s, (bytes, bytearray, mmap.mmap)):
         raise TypeError("Expected s to be bytes, got %s" % type(s))
     if not issubclass(mapper, dict):
         raise TypeError("Expected mapper to be subclass of dict, got %s" % type(mapper))
@@ -489,7 +493,9 @@ def appinfo_loads(data):
 
         offset += app_struct.size
         size = app_info.size + 4 - app_struct.size
-        app = binary_loads(data[offset:offset+size])
+        app, end = binary_loads_at(data,offset)
+        if end != offset + size:
+            raise SyntaxError("Binary VDF ended at index %d, but entry ends at %d" % (end, offset + size))
         offset += size
 
         result[app_id] = app['appinfo']
@@ -529,3 +535,345 @@ def packageinfo_loads(data):
         result[package_id] = package[str(package_id)]
 
     return result
+
+
+def binary_skip_at(s, idx=0, alt_format=False):
+    """
+    Walk over one binary VDF object in ``s`` starting at ``idx`` without
+    decoding it. Returns the index right after the object's end marker.
+    """
+    end_code = ord(BIN_END if not alt_format else BIN_END_ALT)
+    none_code, string_code, widestring_code = ord(BIN_NONE), ord(BIN_STRING), ord(BIN_WIDESTRING)
+    # byte length of the fixed size types
+    fixed_sizes = {ord(BIN_INT32): 4, ord(BIN_POINTER): 4, ord(BIN_COLOR): 4, ord(BIN_FLOAT32): 4,
+                   ord(BIN_UINT64): 8, ord(BIN_INT64): 8}
+    find = s.find
+    length = len(s)
+
+    depth = 1
+    while depth and idx < length:
+        t = s[idx]
+        idx += 1
+
+        if t == end_code:
+            depth -= 1
+            continue
+
+        end = find(b'\x00', idx)
+        if end == -1:
+            raise SyntaxError("Unterminated cstring, index: %d" % idx)
+        idx = end + 1
+
+        if t == none_code:
+            depth += 1
+        elif t == string_code:
+            end = find(b'\x00', idx)
+            if end == -1:
+                raise SyntaxError("Unterminated cstring, index: %d" % idx)
+            idx = end + 1
+        elif t in fixed_sizes:
+            idx += fixed_sizes[t]
+        elif t == widestring_code:
+            end = find(b'\x00\x00', idx)
+            if end == -1:
+                raise SyntaxError("Unterminated cstring, index: %d" % idx)
+            if (end - idx) % 2 != 0:
+                end += 1
+            idx = end + 2
+        else:
+            raise SyntaxError("Unknown data type at index %d: %s" % (idx-1, repr(s[idx-1:idx])))
+
+    return idx
+
+
+def _binary_read_value(s, idx, t, skip=False):
+    # reads (or only steps over) one non-object value of type ``t``
+    if t == BIN_STRING:
+        end = s.find(b'\x00', idx)
+        if end == -1:
+            raise SyntaxError("Unterminated cstring, index: %d" % idx)
+        value = None if skip else s[idx:end].decode('utf-8', 'replace')
+        return value, end + 1
+    elif t == BIN_WIDESTRING:
+        end = s.find(b'\x00\x00', idx)
+        if end == -1:
+            raise SyntaxError("Unterminated cstring, index: %d" % idx)
+        if (end - idx) % 2 != 0:
+            end += 1
+        value = None if skip else s[idx:end].decode('utf-16')
+        return value, end + 2
+    elif t in (BIN_INT32, BIN_POINTER, BIN_COLOR):
+        if skip:
+            return None, idx + 4
+        value = struct.unpack_from('<i', s, idx)[0]
+        if t == BIN_POINTER:
+            value = POINTER(value)
+        elif t == BIN_COLOR:
+            value = COLOR(value)
+        return value, idx + 4
+    elif t == BIN_FLOAT32:
+        return (None if skip else struct.unpack_from('<f', s, idx)[0]), idx + 4
+    elif t == BIN_UINT64:
+        return (None if skip else UINT_64(struct.unpack_from('<Q', s, idx)[0])), idx + 8
+    elif t == BIN_INT64:
+        return (None if skip else INT_64(struct.unpack_from('<q', s, idx)[0])), idx + 8
+    raise SyntaxError("Unknown data type at index %d: %s" % (idx-1, repr(t)))
+
+
+def binary_project_at(s, idx, paths, mapper=dict, alt_format=False):
+    """
+    Deserialize only the parts of the binary VDF in ``s`` at ``idx`` that are
+    selected by ``paths``, an iterable of key tuples such as
+    ``('common', 'name')``. A path ending at a nested object selects the
+    whole object. Everything else is stepped over without being decoded.
+
+    Returns the projected object and the index right after the end marker,
+    like ``binary_loads_at``.
+    """
+    if not issubclass(mapper, dict):
+        raise TypeError("Expected mapper to be subclass of dict, got %s" % type(mapper))
+
+    # None marks a selected subtree, dicts mark keys that need to be descended into
+    trie = {}
+    for path in paths:
+        node = trie
+        for key in path[:-1]:
+            child = node.setdefault(key, {})
+            if child is None:
+                break
+            node = child
+        else:
+            node[path[-1]] = None
+
+    CURRENT_BIN_END = BIN_END if not alt_format else BIN_END_ALT
+
+    stack = [(mapper(), trie)]
+    while True:
+        t = s[idx:idx+1]
+        idx += 1
+
+        if not t:
+            break
+        if t == CURRENT_BIN_END:
+            if len(stack) > 1:
+                stack.pop()
+                continue
+            break
+
+        end = s.find(b'\x00', idx)
+        if end == -1:
+            raise SyntaxError("Unterminated cstring, index: %d" % idx)
+        key = s[idx:end].decode('utf-8', 'replace')
+        idx = end + 1
+
+        obj, node = stack[-1]
+        if key in node:
+            child = node[key]
+            if child is None:
+                if t == BIN_NONE:
+                    obj[key], idx = binary_loads_at(s, idx, mapper, alt_format=alt_format)
+                else:
+                    obj[key], idx = _binary_read_value(s, idx, t)
+                continue
+            if t == BIN_NONE:
+                _m = obj.get(key)
+                if not isinstance(_m, dict):
+                    _m = mapper()
+                    obj[key] = _m
+                stack.append((_m, child))
+                continue
+
+        if t == BIN_NONE:
+            idx = binary_skip_at(s, idx, alt_format)
+        else:
+            _, idx = _binary_read_value(s, idx, t, skip=True)
+
+    if len(stack) != 1:
+        raise SyntaxError("Binary VDF ended at index %d, but stack is not empty." % (idx))
+
+    return stack[0][0], idx
+
+
+def appinfo_index(data):
+    """
+    Build an ``app_id -> (offset, size, change_number)`` index of an appinfo
+    buffer by reading only the per-entry headers. ``offset`` and ``size``
+    locate the binary VDF blob of the entry.
+    """
+    version, universe = struct.unpack_from("<II",data,0)
+    offset = 8
+    if version != 0x07564427 and universe != 1:
+        raise ValueError("Invalid appinfo header")
+    result = {}
+    uint32 = struct.Struct("<I")
+    while True:
+        app_id = uint32.unpack_from(data,offset)[0]
+
+        # AppID = 0 marks the last application in the Appinfo
+        if app_id == 0:
+            break
+
+        size = uint32.unpack_from(data,offset+4)[0]
+        change_number = uint32.unpack_from(data,offset+44)[0]
+        result[app_id] = (offset+48, size-40, change_number)
+        offset += 8 + size
+
+    return result
+
+
+def packageinfo_index(data):
+    """
+    Build a ``package_id -> (offset, size, change_number)`` index of a
+    packageinfo buffer. Package entries carry no size field, so their binary
+    VDF blobs are walked with ``binary_skip_at`` instead of being decoded.
+    """
+    version, universe = struct.unpack_from("<II",data,0)
+    offset = 8
+    if version != 0x06565528 and universe != 1:
+        raise ValueError("Invalid package header")
+    result = {}
+    head_struct = struct.Struct("<I20sIQ")
+    while True:
+        package_id = struct.unpack_from('<I',data,offset)[0]
+
+        # PackageID = -1 marks the last application in the Appinfo
+        if package_id == 0xffffffff:
+            break
+
+        _, _, change_number, _ = head_struct.unpack_from(data,offset)
+        start = offset + head_struct.size
+        offset = binary_skip_at(data,start)
+        result[package_id] = (start, offset-start, change_number)
+
+    return result
+
+
+class LazyInfoDict(object):
+    """
+    Read-only mapping over an appinfo or packageinfo buffer, built from an
+    index returned by ``appinfo_index`` or ``packageinfo_index``. Entries are
+    decoded the first time they are accessed and kept afterwards.
+    """
+    def __init__(self, data, index, root_key):
+        self._data = data
+        self._index = index
+        self._root_key = root_key
+        self._decoded = {}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __getitem__(self, key):
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        offset, size, _ = self._index[key]
+        entry, _ = binary_loads_at(self._data, offset)
+        value = entry[self._root_key(key)]
+        self._decoded[key] = value
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self._index else default
+
+    def project(self, key, paths):
+        """
+        Decode only ``paths`` of the entry ``key`` with ``binary_project_at``.
+        Paths are relative to the entry, the result is not kept.
+        """
+        offset, _, _ = self._index[key]
+        root_key = self._root_key(key)
+        entry, _ = binary_project_at(self._data, offset, [(root_key,) + tuple(path) for path in paths])
+        return entry.get(root_key, {})
+
+    def keys(self):
+        return self._index.keys()
+
+    def change_number(self, key):
+        return self._index[key][2]
+
+    def close(self):
+        """
+        Close the underlying buffer if it is an ``mmap``. Entries decoded so
+        far stay available, decoding others afterwards fails.
+        """
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+def appinfo_lazy_loads(data):
+    """
+    Like ``appinfo_loads`` but only indexes ``data``; apps are decoded on access.
+    """
+    return LazyInfoDict(data, appinfo_index(data), lambda app_id: 'appinfo')
+
+
+def packageinfo_lazy_loads(data):
+    """
+    Like ``packageinfo_loads`` but only indexes ``data``; packages are decoded on access.
+    """
+    return LazyInfoDict(data, packageinfo_index(data), str)
+
+
+def _appinfo_load_entries(path, entries, paths=None):
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        result = {}
+        if paths is not None:
+            paths = [('appinfo',) + tuple(path) for path in paths]
+        for app_id, offset in entries:
+            if paths is None:
+                app, _ = binary_loads_at(data, offset)
+            else:
+                app, _ = binary_project_at(data, offset, paths)
+            result[app_id] = app.get('appinfo', {})
+        return result
+    finally:
+        data.close()
+
+
+def appinfo_parallel_load(path, workers=None, app_ids=None, paths=None):
+    """
+    Decode the appinfo file at ``path`` in a pool of ``workers`` processes.
+    Entries are split into shards of roughly equal byte size using the
+    header index. If ``app_ids`` is given only those apps are decoded, if
+    ``paths`` is given apps are projected with ``binary_project_at``.
+    """
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        index = appinfo_index(data)
+    finally:
+        data.close()
+
+    if app_ids is None:
+        app_ids = index.keys()
+    entries = sorted((index[app_id][0], index[app_id][1], app_id) for app_id in app_ids if app_id in index)
+    if not entries:
+        return {}
+
+    # a few shards per worker keeps the pool busy when entry sizes are uneven
+    workers = workers or os.cpu_count() or 1
+    shard_size = sum(entry[1] for entry in entries) // (workers * 4) + 1
+    shards = [[]]
+    current = 0
+    for offset, size, app_id in entries:
+        if current >= shard_size:
+            shards.append([])
+            current = 0
+        shards[-1].append((app_id, offset))
+        current += size
+
+    result = {}
+    with ProcessPoolExecutor(workers) as executor:
+        for part in executor.map(_appinfo_load_entries, [path] * len(shards), shards, [paths] * len(shards)):
+            result.update(part)
+    return result